@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark de motores de navegador
+Compara el tiempo por link de Selenium y de DevTools Protocol (CDP) sobre una página
+local cuyo botón aparece con retraso, como en los sitios reales.
+
+Uso:
+    python3 benchmarks/bench_engines.py [iteraciones] [selenium|cdp ...]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import statistics
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+# El limitador de visitas y el tope de navegadores no deben condicionar la medición
+os.environ.setdefault('RATE_LIMIT_PER_SECOND', '1000')
+os.environ.setdefault('RATE_LIMIT_BURST', '1000')
+os.environ.setdefault('BUTTON_SELECTOR', '#confirm')
+# Estado en un directorio temporal, sin tocar la base de datos ni los cupos del sistema
+BENCH_DIR = tempfile.mkdtemp(prefix='rpa_bench_')
+os.environ.setdefault('DB_PATH', os.path.join(BENCH_DIR, 'bench.db'))
+os.environ.setdefault('BROWSER_STATE_PATH', os.path.join(BENCH_DIR, 'browser_pids.json'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'rpa'))
+
+from driver_web import WebDriver  # noqa: E402
+from cdp_engine import CDPWebDriver  # noqa: E402
+
+ENGINES = {'selenium': WebDriver, 'cdp': CDPWebDriver}
+
+# El botón se inserta 300 ms después de cargar y avisa al servidor al recibir el clic
+TEST_PAGE = b"""<!DOCTYPE html>
+<html><head><title>RPA benchmark</title></head>
+<body>
+<script>
+setTimeout(function() {
+    const button = document.createElement('button');
+    button.id = 'confirm';
+    button.textContent = 'Confirmar';
+    button.onclick = function() { fetch('/clicked', {method: 'POST'}); };
+    document.body.appendChild(button);
+}, 300);
+</script>
+</body></html>"""
+
+class TestPageHandler(BaseHTTPRequestHandler):
+    clicks = 0
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(TEST_PAGE)))
+        self.end_headers()
+        self.wfile.write(TEST_PAGE)
+
+    def do_POST(self):
+        TestPageHandler.clicks += 1
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def run_engine(name: str, url: str, iterations: int) -> dict:
+    """
+    Procesa la página de prueba varias veces con un motor.
+
+    Returns:
+        dict: Tiempos en segundos y conteo de éxitos y clics recibidos
+    """
+    engine = ENGINES[name]()
+    # Sin la pausa posterior al clic se mide solo el trabajo del motor
+    engine.post_click_wait = 0
+    TestPageHandler.clicks = 0
+    timings = []
+    successes = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        successes += engine.click_button_on_page(url)
+        timings.append(time.perf_counter() - start)
+    # Dar tiempo a que llegue el aviso del último clic
+    time.sleep(0.5)
+    return {'timings': timings, 'successes': successes, 'clicks': TestPageHandler.clicks}
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    engines = sys.argv[2:] or list(ENGINES)
+
+    server = HTTPServer(('127.0.0.1', 0), TestPageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+
+    print(f"{'motor':<10}{'media':>9}{'p50':>9}{'p95':>9}{'éxitos':>9}{'clics':>8}")
+    try:
+        for name in engines:
+            result = run_engine(name, url, iterations)
+            timings = sorted(result['timings'])
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{name:<10}{statistics.mean(timings):>8.3f}s{statistics.median(timings):>8.3f}s"
+                  f"{p95:>8.3f}s{result['successes']:>6}/{iterations}{result['clicks']:>8}")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Módulo de supervisión de procesos del navegador
+Registra cada árbol de procesos chromedriver/chrome lanzado, elimina los huérfanos,
+corta las sesiones que superan el presupuesto de memoria o de tiempo y limita cuántos
+navegadores pueden ejecutarse a la vez según la memoria libre y la carga del host.
+El límite es del host: los cupos son archivos bloqueados con flock, compartidos por
+todos los procesos del sistema RPA y liberados por el kernel si un proceso muere.
+Las tareas que no deben coincidir con ningún navegador abierto, como la limpieza del
+cache de Selenium, bloquean todos los cupos mientras corren.
+"""
+
+import os
+import glob
+import json
+import time
+import fcntl
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Optional
+import psutil
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Con una carga promedio de este múltiplo de los CPU el host se considera saturado
+OVERLOAD_FACTOR = 2
+
+class BrowserUnavailable(Exception):
+    """
+    No se liberó un cupo para el navegador dentro de BROWSER_WAIT_SECONDS.
+    """
+
+class BrowserSupervisor:
+    """
+    Clase para supervisar los procesos de navegador lanzados por el sistema RPA.
+    """
+
+    def __init__(self):
+        """
+        Inicializa el supervisor con la configuración centralizada.
+        """
+        # pid raíz -> {'started': float, 'procs': {pid: create_time}}
+        self._sessions = {}
+        # Descriptores de los archivos de cupo bloqueados por este proceso
+        self._held_slots = []
+        self._lock = threading.Lock()
+        self._slots = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._watchdog = None
+        get_settings().subscribe(self.apply_settings)
+
+    def apply_settings(self, settings):
+        """
+        Aplica la configuración (al iniciar y en cada recarga). Los nuevos límites
+        rigen desde la siguiente revisión del watchdog, y un cambio en MAX_BROWSERS
+        despierta a quienes esperan cupo.
+        """
+        with self._slots:
+            # Archivo con los PID lanzados, para eliminarlos en la siguiente ejecución si el proceso muere.
+            # Cada proceso escribe el suyo (browser_pids.<pid>.json), así varios procesos del
+            # mismo host no se pisan el estado ni se eliminan los navegadores entre sí
+            self.state_path = settings.browser_state_path
+            root, ext = os.path.splitext(self.state_path)
+            self._state_pattern = f"{root}.*{ext}"
+            self._own_state_path = f"{root}.{os.getpid()}{ext}"
+            self._slot_pattern = os.path.join(os.path.dirname(self.state_path), 'browser_slot_{}.lock')
+            self._slot_glob = self._slot_pattern.format('*')
+            self.max_rss_mb = settings.browser_max_rss_mb
+            self.max_seconds = settings.browser_max_seconds
+            self.per_browser_mb = settings.browser_expected_mb
+            self.max_browsers = settings.max_browsers
+            self.wait_seconds = settings.browser_wait_seconds
+            self.poll_interval = settings.watchdog_interval_seconds
+            self._slots.notify_all()
+
+    def max_concurrency(self) -> int:
+        """
+        Calcula cuántos navegadores pueden ejecutarse a la vez según la memoria
+        disponible y la carga promedio del host. Sin memoria para un navegador
+        (BROWSER_EXPECTED_MB) o con el host saturado no se permite ninguno; con
+        carga alta, pero no saturado, se permite uno.
+
+        Returns:
+            int: Número de navegadores permitidos (0 si hay que esperar)
+        """
+        try:
+            available_mb = psutil.virtual_memory().available / 1024 / 1024
+            by_memory = int(available_mb // self.per_browser_mb)
+            cpus = os.cpu_count() or 1
+            load = os.getloadavg()[0]
+            by_load = 0 if load >= cpus * OVERLOAD_FACTOR else max(1, int(cpus - load))
+            return min(self.max_browsers, by_memory, by_load)
+        except Exception as e:
+            logger.warning(f"No se pudo calcular la concurrencia de navegadores: {str(e)}")
+            return 1
+
+    def acquire(self):
+        """
+        Espera hasta que haya un cupo libre en el host para lanzar un navegador,
+        como máximo BROWSER_WAIT_SECONDS.
+
+        Raises:
+            BrowserUnavailable: Si no hubo cupo, memoria libre o carga suficiente a tiempo
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        with self._slots:
+            while not self._try_lock_slot(self.max_concurrency()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BrowserUnavailable(
+                        f"Sin cupo para el navegador tras {self.wait_seconds:.0f}s de espera "
+                        f"(memoria libre o carga del host insuficientes)"
+                    )
+                self._slots.wait(min(self.poll_interval, remaining))
+
+    def _try_lock_slot(self, limit: int) -> bool:
+        """
+        Intenta bloquear uno de los primeros `limit` archivos de cupo del host.
+        Debe llamarse con el lock tomado.
+
+        Returns:
+            bool: True si se obtuvo un cupo
+        """
+        for index in range(limit):
+            fd = os.open(self._slot_pattern.format(index), os.O_CREAT | os.O_RDWR, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            self._held_slots.append(fd)
+            return True
+        return False
+
+    @contextmanager
+    def host_idle(self):
+        """
+        Bloquea todos los cupos del host durante el bloque, para tareas que no deben
+        correr con navegadores abiertos en ningún proceso (como limpiar el cache de
+        Selenium). No espera: si algún cupo está en uso, el bloque recibe False.
+
+        Yields:
+            bool: True si ningún proceso del host tenía un navegador abierto
+        """
+        locked = []
+        with self._lock:
+            paths = set(glob.glob(self._slot_glob))
+            paths.update(self._slot_pattern.format(index) for index in range(self.max_browsers))
+            try:
+                for path in sorted(paths):
+                    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+                    locked.append(fd)
+                    # flock es por descripción de archivo: también choca con los cupos de este proceso
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                idle = True
+            except OSError:
+                idle = False
+        try:
+            yield idle
+        finally:
+            for fd in locked:
+                os.close(fd)
+
+    def register(self, driver) -> Optional[int]:
+        """
+        Registra el árbol de procesos de un driver de Selenium recién creado.
+
+        Args:
+            driver: Instancia de webdriver.Chrome
+        Returns:
+            Optional[int]: PID raíz registrado, necesario para release()
+        """
+        try:
+            root_pid = driver.service.process.pid
+        except Exception as e:
+            logger.warning(f"No se pudo registrar el proceso del navegador: {str(e)}")
+            return None
+        self.register_pid(root_pid)
+        return root_pid
+
+    def register_pid(self, root_pid: int):
+        """
+        Registra un proceso raíz de navegador y sus descendientes.
+
+        Args:
+            root_pid: PID del proceso lanzado (chromedriver o chrome)
+        """
+        with self._lock:
+            self._sessions[root_pid] = {'started': time.monotonic(), 'procs': {}}
+            self._refresh_tree(root_pid)
+            self._save_state()
+        self._ensure_watchdog()
+
+    def release(self, root_pid: Optional[int] = None):
+        """
+        Libera el cupo del navegador y elimina cualquier proceso del árbol que
+        haya sobrevivido al cierre del driver.
+
+        Args:
+            root_pid: PID devuelto por register() o None si el driver no llegó a crearse
+        """
+        with self._slots:
+            session = self._sessions.pop(root_pid, None) if root_pid else None
+            if self._held_slots:
+                # Cerrar el descriptor libera el flock
+                os.close(self._held_slots.pop())
+            self._save_state()
+            self._slots.notify()
+        if session:
+            killed = self._kill(session['procs'])
+            if killed:
+                logger.warning(f"Procesos del navegador que sobrevivieron al cierre eliminados: {killed}")
+
+    def reap_orphans(self) -> int:
+        """
+        Elimina los procesos registrados por ejecuciones anteriores que ya terminaron.
+        Solo se revisan los archivos de estado cuyo proceso dueño murió; los navegadores
+        de otros procesos en ejecución en el mismo host no se tocan.
+
+        Returns:
+            int: Número de procesos eliminados
+        """
+        killed = 0
+        for path in glob.glob(self._state_pattern):
+            if path == self._own_state_path:
+                continue
+            try:
+                with open(path, 'r') as f:
+                    state = json.load(f)
+                if self._owner_alive(state.get('owner'), state.get('owner_started')):
+                    continue
+                orphans = {int(pid): create_time for pid, create_time in state.get('procs', {}).items()}
+            except Exception as e:
+                logger.warning(f"No se pudo leer el estado de procesos del navegador {path}: {str(e)}")
+                continue
+            killed += self._kill(orphans)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        if killed:
+            logger.warning(f"Procesos huérfanos del navegador eliminados: {killed}")
+        return killed
+
+    def shutdown(self):
+        """
+        Detiene el watchdog.
+        """
+        self._stop_event.set()
+
+    def _refresh_tree(self, root_pid: int):
+        """
+        Agrega al registro los descendientes nuevos del proceso raíz (Chrome
+        lanza renderers durante toda la sesión). Debe llamarse con el lock tomado.
+        """
+        procs = self._sessions[root_pid]['procs']
+        try:
+            root = psutil.Process(root_pid)
+            for proc in [root] + root.children(recursive=True):
+                procs.setdefault(proc.pid, proc.create_time())
+        except psutil.Error:
+            pass
+
+    def _session_rss_mb(self, procs: dict) -> float:
+        rss = 0
+        for proc in self._alive(procs):
+            try:
+                rss += proc.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss / 1024 / 1024
+
+    def _alive(self, procs: dict) -> list:
+        """
+        Devuelve los procesos registrados que siguen vivos, descartando PID reutilizados.
+        """
+        alive = []
+        for pid, create_time in procs.items():
+            try:
+                proc = psutil.Process(pid)
+                if abs(proc.create_time() - create_time) < 1 and proc.status() != psutil.STATUS_ZOMBIE:
+                    alive.append(proc)
+            except psutil.Error:
+                pass
+        return alive
+
+    def _kill(self, procs: dict) -> int:
+        alive = self._alive(procs)
+        for proc in alive:
+            try:
+                proc.kill()
+            except psutil.Error:
+                pass
+        psutil.wait_procs(alive, timeout=3)
+        return len(alive)
+
+    def _owner_alive(self, pid, started) -> bool:
+        """
+        Indica si el proceso dueño de un archivo de estado sigue vivo (y no es un PID reutilizado).
+        """
+        try:
+            proc = psutil.Process(int(pid))
+            return abs(proc.create_time() - float(started)) < 1 and proc.status() != psutil.STATUS_ZOMBIE
+        except (psutil.Error, TypeError, ValueError):
+            return False
+
+    def _save_state(self):
+        """
+        Guarda en disco los PID registrados por este proceso, o elimina el archivo si
+        no hay navegadores activos. Debe llamarse con el lock tomado.
+        """
+        procs = {}
+        for session in self._sessions.values():
+            procs.update({str(pid): ct for pid, ct in session['procs'].items()})
+        try:
+            if not procs:
+                if os.path.exists(self._own_state_path):
+                    os.remove(self._own_state_path)
+                return
+            state = {
+                'owner': os.getpid(),
+                'owner_started': psutil.Process().create_time(),
+                'procs': procs,
+            }
+            with open(self._own_state_path, 'w') as f:
+                json.dump(state, f)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el estado de procesos del navegador: {str(e)}")
+
+    def _ensure_watchdog(self):
+        if self._watchdog and self._watchdog.is_alive():
+            return
+        self._stop_event.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="browser-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def _watch(self):
+        """
+        Revisa periódicamente las sesiones activas y corta las que exceden su presupuesto.
+        """
+        while not self._stop_event.wait(self.poll_interval):
+            over_budget = []
+            with self._lock:
+                for root_pid, session in self._sessions.items():
+                    self._refresh_tree(root_pid)
+                    elapsed = time.monotonic() - session['started']
+                    rss_mb = self._session_rss_mb(session['procs'])
+                    if elapsed > self.max_seconds:
+                        over_budget.append((root_pid, f"{elapsed:.1f}s > {self.max_seconds}s"))
+                    elif rss_mb > self.max_rss_mb:
+                        over_budget.append((root_pid, f"{rss_mb:.0f} MB > {self.max_rss_mb} MB"))
+                self._save_state()
+                procs_to_kill = [(pid, reason, dict(self._sessions[pid]['procs'])) for pid, reason in over_budget]
+            for root_pid, reason, procs in procs_to_kill:
+                logger.warning(f"Sesión de navegador {root_pid} excede su presupuesto ({reason}), terminando")
+                self._kill(procs)
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+def get_supervisor() -> BrowserSupervisor:
+    """
+    Obtiene el supervisor compartido del proceso, eliminando los huérfanos de
+    ejecuciones anteriores la primera vez que se crea.
+    """
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = BrowserSupervisor()
+            _supervisor.reap_orphans()
+        return _supervisor
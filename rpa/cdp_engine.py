@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Motor de automatización por Chrome DevTools Protocol
+Controla Chrome headless directamente por el websocket de DevTools, sin chromedriver:
+cada comando es un mensaje sobre una conexión ya abierta en lugar de una petición HTTP,
+y la espera del botón ocurre dentro de la página (un MutationObserver y una revisión
+cada 250 ms) en vez de consultar en bucle por el websocket.
+Se activa con BROWSER_ENGINE=cdp y expone la misma interfaz que WebDriver.
+"""
+
+import os
+import json
+import glob
+import time
+import shutil
+import tempfile
+import subprocess
+import logging
+from collections import deque
+from typing import Optional
+from urllib.request import build_opener, ProxyHandler
+import websocket
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from driver_web import WebDriver, CHROME_ARGUMENTS
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Ejecutables buscados en el PATH si no se configura CHROME_BINARY
+CHROME_CANDIDATES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser')
+
+# Espera dentro de la página: resuelve con el primer elemento clickeable del selector,
+# comprobando cuando un MutationObserver informa cambios en el DOM y, cada 250 ms, por
+# los cambios que no son mutaciones (hojas de estilo, animaciones, layout), o con null
+# al vencer el plazo
+WAIT_FOR_CLICKABLE = """(function(selector, timeout) {
+    const clickable = function(element) {
+        const rect = element.getBoundingClientRect();
+        const style = window.getComputedStyle(element);
+        return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden'
+            && style.display !== 'none' && !element.disabled;
+    };
+    const find = function() {
+        const element = document.querySelector(selector);
+        return element && clickable(element) ? element : null;
+    };
+    return new Promise(function(resolve) {
+        const found = find();
+        if (found) {
+            resolve(found);
+            return;
+        }
+        const finish = function(element) {
+            observer.disconnect();
+            clearInterval(poll);
+            clearTimeout(timer);
+            resolve(element);
+        };
+        const check = function() {
+            const element = find();
+            if (element) {
+                finish(element);
+            }
+        };
+        const observer = new MutationObserver(check);
+        const poll = setInterval(check, 250);
+        const timer = setTimeout(function() { finish(null); }, timeout);
+        observer.observe(document, {childList: true, subtree: true, attributes: true});
+    });
+})(%s, %d)"""
+
+# Margen del socket sobre el plazo de la espera dentro de la página
+WAIT_MARGIN_SECONDS = 5
+
+def find_chrome_binary() -> str:
+    """
+    Busca el ejecutable de Chrome: CHROME_BINARY, el PATH o la caché de Selenium Manager.
+
+    Returns:
+        str: Ruta del ejecutable
+    Raises:
+        WebDriverException: Si no se encuentra Chrome
+    """
+    configured = get_settings().chrome_binary
+    if configured:
+        return configured
+    for name in CHROME_CANDIDATES:
+        path = shutil.which(name)
+        if path:
+            return path
+    cached = sorted(glob.glob(os.path.expanduser('~/.cache/selenium/chrome/*/*/chrome')))
+    if cached:
+        return cached[-1]
+    raise WebDriverException("No se encontró Chrome; configure CHROME_BINARY")
+
+class ChromeCDP:
+    """
+    Sesión de Chrome headless controlada por DevTools Protocol.
+    """
+
+    def __init__(self, timeout: int):
+        """
+        Lanza Chrome y se conecta al websocket de su primera pestaña.
+
+        Args:
+            timeout: Segundos máximos para arrancar y para cargar cada página
+        Raises:
+            WebDriverException: Si Chrome no arranca o no expone DevTools
+        """
+        self.timeout = timeout
+        self._next_id = 0
+        self._events = deque()
+        self._ws = None
+        binary = find_chrome_binary()
+        self.user_data_dir = tempfile.mkdtemp(prefix='rpa_cdp_')
+        try:
+            self.process = subprocess.Popen(
+                [binary, *CHROME_ARGUMENTS,
+                 '--remote-debugging-port=0', f'--user-data-dir={self.user_data_dir}',
+                 '--no-first-run', 'about:blank'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        except Exception:
+            # Sin proceso que terminar: solo queda el perfil temporal
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+            raise
+        try:
+            port = self._wait_for_port()
+            self._ws = websocket.create_connection(self._page_websocket_url(port),
+                                                   timeout=timeout, suppress_origin=True)
+        except Exception:
+            self.quit()
+            raise
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def _wait_for_port(self) -> int:
+        """
+        Lee el puerto de DevTools que Chrome escribe en DevToolsActivePort al arrancar.
+        """
+        port_file = os.path.join(self.user_data_dir, 'DevToolsActivePort')
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise WebDriverException(f"Chrome terminó al arrancar (código {self.process.returncode})")
+            try:
+                with open(port_file, 'r') as f:
+                    port = f.readline().strip()
+                if port:
+                    return int(port)
+            except (OSError, ValueError):
+                pass
+            time.sleep(0.05)
+        raise WebDriverException("Chrome no expuso el puerto de DevTools a tiempo")
+
+    def _page_websocket_url(self, port: int) -> str:
+        # Conexión local: sin pasar por el proxy que definan las variables de entorno
+        opener = build_opener(ProxyHandler({}))
+        with opener.open(f"http://127.0.0.1:{port}/json/list", timeout=self.timeout) as response:
+            targets = json.loads(response.read())
+        for target in targets:
+            if target.get('type') == 'page':
+                return target['webSocketDebuggerUrl']
+        raise WebDriverException("Chrome no tiene ninguna pestaña disponible")
+
+    def _call(self, method: str, timeout: float = None, **params) -> dict:
+        """
+        Envía un comando y espera su respuesta, guardando los eventos que lleguen antes.
+
+        Args:
+            method: Método de DevTools
+            timeout: Segundos máximos de espera de la respuesta (por defecto, el timeout de la sesión)
+        Returns:
+            dict: Resultado del comando
+        Raises:
+            TimeoutException: Si Chrome no responde a tiempo
+            WebDriverException: Si Chrome responde con un error
+        """
+        self._next_id += 1
+        message_id = self._next_id
+        self._ws.send(json.dumps({'id': message_id, 'method': method, 'params': params}))
+        self._ws.settimeout(timeout or self.timeout)
+        try:
+            while True:
+                message = json.loads(self._ws.recv())
+                if message.get('id') == message_id:
+                    if 'error' in message:
+                        raise WebDriverException(f"{method}: {message['error'].get('message')}")
+                    return message.get('result', {})
+                if 'method' in message:
+                    self._events.append(message)
+        except websocket.WebSocketTimeoutException:
+            raise TimeoutException(f"Chrome no respondió a {method}")
+        finally:
+            self._ws.settimeout(self.timeout)
+
+    def _wait_event(self, methods, timeout: float) -> Optional[dict]:
+        """
+        Espera el primer evento de la lista. Devuelve None si vence el tiempo.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            while self._events:
+                event = self._events.popleft()
+                if event['method'] in methods:
+                    return event
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self._ws.settimeout(remaining)
+            try:
+                message = json.loads(self._ws.recv())
+            except websocket.WebSocketTimeoutException:
+                return None
+            finally:
+                self._ws.settimeout(self.timeout)
+            if 'method' in message:
+                self._events.append(message)
+
+    def get(self, url: str):
+        """
+        Navega a la URL y espera el evento load de la página.
+
+        Raises:
+            TimeoutException: Si la página no carga dentro del tiempo de espera
+            WebDriverException: Si la navegación falla
+        """
+        self._call('Page.enable')
+        self._events.clear()
+        result = self._call('Page.navigate', url=url)
+        if result.get('errorText'):
+            raise WebDriverException(f"Error navegando a {url}: {result['errorText']}")
+        if not self._wait_event(('Page.loadEventFired',), self.timeout):
+            raise TimeoutException(f"Timeout cargando {url}")
+
+    def execute_script(self, script: str):
+        """
+        Ejecuta un script con la misma semántica que Selenium (cuerpo de función con return).
+        """
+        result = self._call('Runtime.evaluate', expression=f"(function() {{ {script} }})()",
+                            returnByValue=True, awaitPromise=True)
+        if 'exceptionDetails' in result:
+            raise WebDriverException(f"Error ejecutando script: {result['exceptionDetails'].get('text')}")
+        return result.get('result', {}).get('value')
+
+    @property
+    def title(self) -> str:
+        return self.execute_script("return document.title;")
+
+    def wait_for_clickable(self, selector: str, timeout: float) -> str:
+        """
+        Espera a que el selector exista y se pueda hacer clic. La espera ocurre dentro
+        de la página (MutationObserver y una revisión cada 250 ms), sin consultas
+        repetidas por el websocket.
+
+        Returns:
+            str: objectId del elemento
+        Raises:
+            TimeoutException: Si no aparece dentro del tiempo de espera
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutException(f"Timeout esperando {selector}")
+            try:
+                result = self._call('Runtime.evaluate', timeout=remaining + WAIT_MARGIN_SECONDS,
+                                    expression=WAIT_FOR_CLICKABLE % (json.dumps(selector), remaining * 1000),
+                                    awaitPromise=True)
+            except WebDriverException as e:
+                # Una redirección destruye el contexto de la espera: se repite en la nueva página
+                if 'context' in str(e).lower() and not isinstance(e, TimeoutException):
+                    continue
+                raise
+            if 'exceptionDetails' in result:
+                raise WebDriverException(f"Error esperando {selector}: {result['exceptionDetails'].get('text')}")
+            object_id = result.get('result', {}).get('objectId')
+            if object_id:
+                return object_id
+
+    def click(self, object_id: str):
+        """
+        Hace clic en el centro del elemento con eventos de ratón reales.
+        """
+        self._call('DOM.scrollIntoViewIfNeeded', objectId=object_id)
+        quads = self._call('DOM.getContentQuads', objectId=object_id).get('quads')
+        if not quads:
+            raise WebDriverException("El elemento no tiene área visible para hacer clic")
+        quad = quads[0]
+        x = sum(quad[0::2]) / 4
+        y = sum(quad[1::2]) / 4
+        self._call('Input.dispatchMouseEvent', type='mouseMoved', x=x, y=y)
+        self._call('Input.dispatchMouseEvent', type='mousePressed', x=x, y=y, button='left', clickCount=1)
+        self._call('Input.dispatchMouseEvent', type='mouseReleased', x=x, y=y, button='left', clickCount=1)
+
+    def quit(self):
+        """
+        Cierra la conexión, termina Chrome y elimina su perfil temporal.
+        """
+        if self._ws:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+class CDPWebDriver(WebDriver):
+    """
+    WebDriver que usa DevTools Protocol directamente en lugar de Selenium.
+    """
+
+    def _setup_driver(self) -> ChromeCDP:
+        """
+        Lanza Chrome headless y lo registra en el supervisor.
+
+        Returns:
+            ChromeCDP: Sesión conectada
+        """
+        try:
+            driver = ChromeCDP(self.timeout)
+            self.supervisor.register_pid(driver.pid)
+            self._browser_pid = driver.pid
+            return driver
+
+        except Exception as e:
+            logger.error(f"Error inicializando Chrome por CDP: {str(e)}")
+            raise
+
+    def _click_button(self):
+        """
+        Espera el botón dentro de la página y hace clic en él.
+
+        Raises:
+            TimeoutException: Si el botón no aparece dentro del tiempo de espera
+        """
+        object_id = self.driver.wait_for_clickable(self.button_selector, self.timeout)
+        logger.info(f"Botón encontrado con selector: {self.button_selector}")
+        self.driver.click(object_id)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Módulo de coordinación entre nodos
+Reemplaza el lockfile local por leases en una tabla SQLite compartida, de modo que
+varios procesos o hosts puedan atender el mismo buzón:
+- Elección de líder para las tareas de mantenimiento (un lease por tarea).
+- Reparto de los correos entre los workers vivos por UID.
+- Un lease por correo en proceso, para que dos workers nunca ejecuten el mismo link;
+  si un worker muere, sus leases vencen y otro toma el trabajo.
+
+Los vencimientos usan el reloj de cada host, por lo que deben estar sincronizados (NTP).
+"""
+
+import os
+import time
+import socket
+import sqlite3
+import threading
+import logging
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+class Coordinator:
+    """
+    Clase para coordinar workers mediante leases en la base de datos.
+    """
+
+    def __init__(self):
+        """
+        Inicializa el coordinador con la configuración centralizada y crea las tablas.
+        """
+        settings = get_settings()
+        self.node_id = settings.node_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.hostname = socket.gethostname()
+        self.db_path = settings.coordination_db_path or settings.db_path
+        self._workers = [self.node_id]
+        self._stop_event = threading.Event()
+        self._heartbeat = None
+        settings.subscribe(self.apply_settings)
+        self._create_tables()
+
+    def apply_settings(self, settings):
+        """
+        Aplica la configuración (al iniciar y en cada recarga).
+        """
+        self.lease_ttl = settings.lease_ttl_seconds
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit: las transacciones se abren explícitamente con BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _create_tables(self):
+        """
+        Crea las tablas de leases y workers si no existen.
+        """
+        connection = self._connect()
+        try:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS workers (
+                    node_id TEXT PRIMARY KEY,
+                    hostname TEXT,
+                    heartbeat_at REAL NOT NULL
+                )
+            ''')
+        finally:
+            connection.close()
+
+    def acquire_lease(self, name: str) -> bool:
+        """
+        Toma o renueva un lease. Solo se concede si está libre, vencido o ya es propio.
+
+        Args:
+            name: Nombre del lease
+        Returns:
+            bool: True si este nodo es el dueño del lease
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+            if row and row[0] != self.node_id and row[1] > now:
+                connection.execute('ROLLBACK')
+                return False
+            if row and row[0] != self.node_id:
+                logger.warning(f"Lease '{name}' vencido de {row[0]}, tomado por {self.node_id}")
+            connection.execute('''
+                INSERT OR REPLACE INTO leases (name, owner, expires_at)
+                VALUES (?, ?, ?)
+            ''', (name, self.node_id, now + self.lease_ttl))
+            connection.execute('COMMIT')
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error tomando lease '{name}': {str(e)}")
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            return False
+        finally:
+            connection.close()
+
+    def release_lease(self, name: str):
+        """
+        Libera un lease propio.
+        """
+        connection = self._connect()
+        try:
+            connection.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, self.node_id))
+        except sqlite3.Error as e:
+            logger.error(f"Error liberando lease '{name}': {str(e)}")
+        finally:
+            connection.close()
+
+    def is_leader(self, task: str) -> bool:
+        """
+        Indica si este nodo es el líder de una tarea de mantenimiento.
+
+        Args:
+            task: Nombre de la tarea (un líder por tarea)
+        """
+        return self.acquire_lease(f"leader:{task}")
+
+    def claim(self, uid: str) -> bool:
+        """
+        Reserva un correo para procesarlo en este nodo.
+
+        Args:
+            uid: UID IMAP del correo
+        Returns:
+            bool: False si otro worker vivo lo tiene reservado
+        """
+        return self.acquire_lease(f"uid:{uid}")
+
+    def release_claim(self, uid: str):
+        """
+        Libera la reserva de un correo ya procesado.
+        """
+        self.release_lease(f"uid:{uid}")
+
+    def refresh_workers(self) -> list:
+        """
+        Registra el latido de este nodo y actualiza la lista de workers vivos, que
+        define el reparto de correos del ciclo.
+
+        Returns:
+            list: Identificadores de los workers vivos, ordenados
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute('''
+                INSERT OR REPLACE INTO workers (node_id, hostname, heartbeat_at)
+                VALUES (?, ?, ?)
+            ''', (self.node_id, self.hostname, now))
+            rows = connection.execute('''
+                SELECT node_id FROM workers WHERE heartbeat_at > ? ORDER BY node_id
+            ''', (now - self.lease_ttl,)).fetchall()
+            self._workers = [row[0] for row in rows] or [self.node_id]
+        except sqlite3.Error as e:
+            logger.error(f"Error actualizando workers: {str(e)}")
+        finally:
+            connection.close()
+        return self._workers
+
+    def owns(self, uid: str) -> bool:
+        """
+        Indica si el correo corresponde a este nodo según el reparto por UID
+        entre los workers vivos.
+        """
+        try:
+            index = int(uid) % len(self._workers)
+        except (TypeError, ValueError):
+            index = sum(str(uid).encode()) % len(self._workers)
+        return self._workers[index] == self.node_id
+
+    def purge_expired(self) -> int:
+        """
+        Elimina leases vencidos y workers sin latido (tarea de mantenimiento).
+
+        Returns:
+            int: Número de filas eliminadas
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            deleted = connection.execute('DELETE FROM leases WHERE expires_at < ?', (now,)).rowcount
+            deleted += connection.execute('DELETE FROM workers WHERE heartbeat_at < ?',
+                                          (now - self.lease_ttl,)).rowcount
+            return deleted
+        except sqlite3.Error as e:
+            logger.error(f"Error eliminando leases vencidos: {str(e)}")
+            return 0
+        finally:
+            connection.close()
+
+    def _renew_all(self):
+        """
+        Extiende todos los leases propios y el latido del nodo.
+        """
+        connection = self._connect()
+        try:
+            connection.execute('UPDATE leases SET expires_at = ? WHERE owner = ?',
+                               (time.time() + self.lease_ttl, self.node_id))
+        except sqlite3.Error as e:
+            logger.error(f"Error renovando leases: {str(e)}")
+        finally:
+            connection.close()
+        self.refresh_workers()
+
+    def start(self):
+        """
+        Registra el nodo e inicia el hilo que renueva sus leases cada tercio del TTL.
+        """
+        self.refresh_workers()
+        if self._heartbeat and self._heartbeat.is_alive():
+            return
+        self._stop_event.clear()
+        self._heartbeat = threading.Thread(target=self._beat, name="coordination-heartbeat", daemon=True)
+        self._heartbeat.start()
+        logger.info(f"Nodo {self.node_id} registrado ({len(self._workers)} workers vivos)")
+
+    def stop(self):
+        """
+        Detiene el latido y libera los leases del nodo para que otros los tomen sin esperar.
+        """
+        self._stop_event.set()
+        connection = self._connect()
+        try:
+            connection.execute('DELETE FROM leases WHERE owner = ?', (self.node_id,))
+            connection.execute('DELETE FROM workers WHERE node_id = ?', (self.node_id,))
+        except sqlite3.Error as e:
+            logger.error(f"Error liberando leases del nodo: {str(e)}")
+        finally:
+            connection.close()
+
+    def _beat(self):
+        while not self._stop_event.wait(self.lease_ttl / 3):
+            self._renew_all()
+
+_coordinator = None
+_coordinator_lock = threading.Lock()
+
+def get_coordinator() -> Coordinator:
+    """
+    Obtiene el coordinador compartido del proceso.
+    """
+    global _coordinator
+    with _coordinator_lock:
+        if _coordinator is None:
+            _coordinator = Coordinator()
+        return _coordinator
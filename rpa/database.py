@@ -5,6 +5,8 @@ Contiene funciones para crear tablas e insertar registros del proceso RPA.
 """
 
 import os
+import gzip
+import html
 import sqlite3
 import logging
 from datetime import datetime
@@ -12,8 +14,22 @@ from typing import Optional
 from dotenv import load_dotenv
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
 logger = logging.getLogger(__name__)
 
+# Formatos de reporte disponibles; 'html' envía solo el resumen en el cuerpo del correo
+REPORT_FORMATS = ('xlsx', 'csv.gz', 'parquet', 'html')
+# Tablas exportadas y nombre de su hoja/archivo
+REPORT_TABLES = (('rpa_success', 'Exitosos'), ('rpa_failed', 'Fallidos'))
+# Tipos de columna de SQLite a tipos de Parquet (el resto se exporta como texto)
+SQLITE_TO_ARROW = {'INTEGER': 'int64', 'REAL': 'float64'}
+
 class Database:
     """
     Clase para manejar la base de datos SQLite del sistema RPA.
@@ -290,19 +306,21 @@ class Database:
             if self.connection:
                 self.connection.close() 
 
-    def export_to_excel(self, excel_path: str = "reporte_rpa.xlsx") -> str:
+    def export_to_excel(self, excel_path: str = "reporte_rpa.xlsx", month: Optional[str] = None) -> str:
         """
         Exporta las tablas rpa_success y rpa_failed a un archivo Excel con dos hojas.
         Args:
             excel_path: Ruta del archivo Excel a crear
+            month: Mes a exportar con formato AAAA-MM, o None para todo el historial
         Returns:
             str: Ruta del archivo generado
         """
         try:
             self.connection = sqlite3.connect(self.db_path)
+            where, params = self._month_filter(month)
             # Leer ambas tablas a DataFrames
-            df_success = pd.read_sql_query("SELECT * FROM rpa_success", self.connection)
-            df_failed = pd.read_sql_query("SELECT * FROM rpa_failed", self.connection)
+            df_success = pd.read_sql_query(f"SELECT * FROM rpa_success{where}", self.connection, params=params)
+            df_failed = pd.read_sql_query(f"SELECT * FROM rpa_failed{where}", self.connection, params=params)
             # Escribir a Excel con dos hojas
             with pd.ExcelWriter(excel_path, engine="openpyxl") as writer:
                 df_success.to_excel(writer, sheet_name="Exitosos", index=False)
@@ -313,4 +331,199 @@ class Database:
             return ""
         finally:
             if self.connection:
-                self.connection.close() 
\ No newline at end of file
+                self.connection.close()
+
+    def export_to_csv_gz(self, base_path: str = "reporte_rpa", month: Optional[str] = None,
+                         chunksize: int = 5000) -> list:
+        """
+        Exporta cada tabla a un CSV comprimido con gzip, leyendo por bloques para
+        no cargar todo el historial en memoria.
+        Args:
+            base_path: Prefijo de los archivos a crear
+            month: Mes a exportar con formato AAAA-MM, o None para todo el historial
+            chunksize: Filas leídas por bloque
+        Returns:
+            list: Rutas de los archivos generados
+        """
+        paths = []
+        try:
+            self.connection = sqlite3.connect(self.db_path)
+            where, params = self._month_filter(month)
+            for table, name in REPORT_TABLES:
+                path = f"{base_path}_{name.lower()}.csv.gz"
+                query = f"SELECT * FROM {table}{where}"
+                with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+                    chunks = pd.read_sql_query(query, self.connection, params=params, chunksize=chunksize)
+                    for i, chunk in enumerate(chunks):
+                        chunk.to_csv(f, index=False, header=(i == 0))
+                paths.append(path)
+            return paths
+        except Exception as e:
+            logger.error(f"Error exportando a CSV: {str(e)}")
+            return []
+        finally:
+            if self.connection:
+                self.connection.close()
+
+    def export_to_parquet(self, base_path: str = "reporte_rpa", month: Optional[str] = None,
+                          chunksize: int = 5000) -> list:
+        """
+        Exporta cada tabla a un archivo Parquet escribiendo por bloques. Requiere pyarrow.
+        Args:
+            base_path: Prefijo de los archivos a crear
+            month: Mes a exportar con formato AAAA-MM, o None para todo el historial
+            chunksize: Filas leídas por bloque
+        Returns:
+            list: Rutas de los archivos generados
+        """
+        if pa is None:
+            logger.error("pyarrow no está instalado, no se puede exportar a Parquet")
+            return []
+        paths = []
+        try:
+            self.connection = sqlite3.connect(self.db_path)
+            where, params = self._month_filter(month)
+            for table, name in REPORT_TABLES:
+                # Esquema fijo a partir de las columnas de la tabla, para que todos
+                # los bloques coincidan aunque alguno tenga columnas vacías
+                columns = self.connection.execute(f"PRAGMA table_info({table})").fetchall()
+                schema = pa.schema([(col[1], SQLITE_TO_ARROW.get(col[2].upper(), 'string')) for col in columns])
+                path = f"{base_path}_{name.lower()}.parquet"
+                query = f"SELECT * FROM {table}{where}"
+                with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+                    for chunk in pd.read_sql_query(query, self.connection, params=params, chunksize=chunksize):
+                        writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                paths.append(path)
+            return paths
+        except Exception as e:
+            logger.error(f"Error exportando a Parquet: {str(e)}")
+            return []
+        finally:
+            if self.connection:
+                self.connection.close()
+
+    def count_report_rows(self) -> int:
+        """
+        Cuenta el total de filas de las tablas del reporte.
+        """
+        try:
+            self.connection = sqlite3.connect(self.db_path)
+            cursor = self.connection.cursor()
+            return sum(cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                       for table, _ in REPORT_TABLES)
+        except Exception as e:
+            logger.error(f"Error contando registros: {str(e)}")
+            return 0
+        finally:
+            if self.connection:
+                self.connection.close()
+
+    def get_report_months(self) -> list:
+        """
+        Obtiene los meses (AAAA-MM) con registros, en orden cronológico.
+        """
+        try:
+            self.connection = sqlite3.connect(self.db_path)
+            cursor = self.connection.cursor()
+            cursor.execute('''
+                SELECT strftime('%Y-%m', timestamp) AS month FROM rpa_success
+                UNION
+                SELECT strftime('%Y-%m', timestamp) FROM rpa_failed
+                ORDER BY month
+            ''')
+            return [row[0] for row in cursor.fetchall() if row[0]]
+        except Exception as e:
+            logger.error(f"Error obteniendo meses del reporte: {str(e)}")
+            return []
+        finally:
+            if self.connection:
+                self.connection.close()
+
+    def export_report(self, report_format: str = "xlsx", base_path: str = "reporte_rpa",
+                      compact_rows: int = 20000, split_rows: int = 200000) -> list:
+        """
+        Exporta el reporte en el formato pedido, cambiando a un formato compacto o
+        dividiendo por mes cuando el historial es grande.
+        Args:
+            report_format: Uno de REPORT_FORMATS
+            base_path: Prefijo de los archivos a crear
+            compact_rows: Filas a partir de las cuales XLSX se reemplaza por Parquet
+                (o CSV gzip si pyarrow no está instalado)
+            split_rows: Filas a partir de las cuales se genera un archivo por mes
+        Returns:
+            list: Rutas de los archivos generados (vacía para 'html')
+        """
+        if report_format not in REPORT_FORMATS:
+            logger.warning(f"Formato de reporte desconocido '{report_format}', se usa xlsx")
+            report_format = 'xlsx'
+        if report_format == 'html':
+            return []
+        if report_format == 'parquet' and pa is None:
+            logger.warning("pyarrow no está instalado, se usa CSV gzip en lugar de Parquet")
+            report_format = 'csv.gz'
+
+        total = self.count_report_rows()
+        if report_format == 'xlsx' and total > compact_rows:
+            report_format = 'parquet' if pa is not None else 'csv.gz'
+            logger.info(f"Historial de {total} filas, se cambia el reporte a formato {report_format}")
+
+        months = [None]
+        if total > split_rows:
+            months = self.get_report_months()
+            logger.info(f"Historial de {total} filas, se divide el reporte en {len(months)} meses")
+
+        paths = []
+        for month in months:
+            prefix = f"{base_path}_{month}" if month else base_path
+            if report_format == 'xlsx':
+                path = self.export_to_excel(f"{prefix}.xlsx", month)
+                paths.extend([path] if path else [])
+            elif report_format == 'csv.gz':
+                paths.extend(self.export_to_csv_gz(prefix, month))
+            else:
+                paths.extend(self.export_to_parquet(prefix, month))
+        return paths
+
+    def build_summary_html(self, days: int = 7) -> str:
+        """
+        Genera un resumen HTML con los totales por estado y la actividad reciente.
+        Args:
+            days: Días de actividad reciente a incluir
+        Returns:
+            str: Documento HTML con el resumen
+        """
+        try:
+            self.connection = sqlite3.connect(self.db_path)
+            cursor = self.connection.cursor()
+            rows = []
+            for table, name in REPORT_TABLES:
+                cursor.execute(f'''
+                    SELECT status, COUNT(*), SUM(timestamp >= datetime('now', ?)), AVG(processing_time)
+                    FROM {table}
+                    GROUP BY status
+                    ORDER BY status
+                ''', (f'-{days} days',))
+                for status, total, recent, avg_time in cursor.fetchall():
+                    rows.append(f"<tr><td>{name}</td><td>{html.escape(str(status))}</td>"
+                                f"<td>{total}</td><td>{recent or 0}</td><td>{avg_time or 0:.1f}</td></tr>")
+            body = "".join(rows) or "<tr><td colspan='5'>Sin registros</td></tr>"
+            return ("<html><body><h2>Reporte RPA</h2>"
+                    "<table border='1' cellpadding='4' cellspacing='0'>"
+                    f"<tr><th>Tabla</th><th>Estado</th><th>Total</th><th>Últimos {days} días</th>"
+                    "<th>Tiempo medio (s)</th></tr>"
+                    f"{body}</table></body></html>")
+        except Exception as e:
+            logger.error(f"Error generando resumen HTML: {str(e)}")
+            return ""
+        finally:
+            if self.connection:
+                self.connection.close()
+
+    @staticmethod
+    def _month_filter(month: Optional[str]) -> tuple:
+        """
+        Construye el filtro SQL por mes para las consultas de exportación.
+        """
+        if not month:
+            return "", ()
+        return " WHERE strftime('%Y-%m', timestamp) = ?", (month,)
@@ -4,7 +4,6 @@ Módulo para automatización web
 Contiene funciones para abrir páginas web y hacer clic en botones usando Selenium.
 """
 
-import os
 import time
 import logging
 from typing import Optional
@@ -14,24 +13,68 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, WebDriverException
-from dotenv import load_dotenv
+from browser_supervisor import get_supervisor
+from rate_limiter import get_rate_limiter, THROTTLE_STATUS_CODES
+from settings import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Argumentos de Chrome comunes a todos los motores
+CHROME_ARGUMENTS = (
+    # Configuración para modo headless y VPS
+    '--headless',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--window-size=1920,1080',
+    '--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36',
+    
+    # Configuraciones adicionales para estabilidad
+    '--disable-extensions',
+    '--disable-plugins',
+    '--disable-images',
+    # '--disable-javascript',  # Descomenta si no necesitas JS
+    
+    # Configuraciones para evitar descargas automáticas
+    '--disable-background-downloads',
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+    '--disable-features=TranslateUI',
+    '--disable-ipc-flooding-protection',
+    
+    # Configuración para usar cache local y evitar descargas
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+)
+
 class WebDriver:
     """
     Clase para manejar la automatización web usando Selenium.
     """
     
+    # Segundos de espera tras el clic para que la acción se complete
+    post_click_wait = 2
+    
     def __init__(self):
         """
-        Inicializa el driver web con configuración desde variables de entorno.
+        Inicializa el driver web con la configuración centralizada.
         """
-        load_dotenv()
-        
-        self.button_selector = os.getenv('BUTTON_SELECTOR', 'button')
-        self.timeout = int(os.getenv('TIMEOUT_SECONDS', '10'))
+        get_settings().subscribe(self.apply_settings)
         self.driver = None
+        self.supervisor = get_supervisor()
+        self._browser_pid = None
+        self.rate_limiter = get_rate_limiter()
+    
+    def apply_settings(self, settings):
+        """
+        Aplica la configuración (al iniciar y en cada recarga).
+        """
+        self.button_selector = settings.button_selector
+        self.timeout = settings.timeout_seconds
+        self.chrome_binary = settings.chrome_binary
         
     def _setup_driver(self) -> webdriver.Chrome:
         """
@@ -41,37 +84,14 @@ class WebDriver:
             webdriver.Chrome: Driver configurado
         """
         chrome_options = Options()
-        
-        # Configuración para modo headless y VPS
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36')
-        
-        # Configuraciones adicionales para estabilidad
-        chrome_options.add_argument('--disable-extensions')
-        chrome_options.add_argument('--disable-plugins')
-        chrome_options.add_argument('--disable-images')
-        # chrome_options.add_argument('--disable-javascript')  # Descomenta si no necesitas JS
-        
-        # Configuraciones para evitar descargas automáticas
-        chrome_options.add_argument('--disable-background-downloads')
-        chrome_options.add_argument('--disable-background-networking')
-        chrome_options.add_argument('--disable-background-timer-throttling')
-        chrome_options.add_argument('--disable-backgrounding-occluded-windows')
-        chrome_options.add_argument('--disable-renderer-backgrounding')
-        chrome_options.add_argument('--disable-features=TranslateUI')
-        chrome_options.add_argument('--disable-ipc-flooding-protection')
-        
-        # Configuración para usar cache local y evitar descargas
-        chrome_options.add_argument('--disable-component-update')
-        chrome_options.add_argument('--disable-default-apps')
-        chrome_options.add_argument('--disable-sync')
+        for argument in CHROME_ARGUMENTS:
+            chrome_options.add_argument(argument)
+        if self.chrome_binary:
+            chrome_options.binary_location = self.chrome_binary
         
         try:
             driver = webdriver.Chrome(options=chrome_options)
+            self._browser_pid = self.supervisor.register(driver)
             driver.set_page_load_timeout(self.timeout)
             return driver
             
@@ -88,7 +108,16 @@ class WebDriver:
             
         Returns:
             bool: True si se hizo clic exitosamente, False en caso contrario
+        Raises:
+            BrowserUnavailable: Si el host no liberó un cupo para el navegador a tiempo
         """
+        self.driver = None
+        self._browser_pid = None
+        success = False
+        status_code = None
+        # Respetar la tasa de visitas del dominio y esperar cupo según memoria libre y carga del host
+        self.rate_limiter.acquire(url)
+        self.supervisor.acquire()
         try:
             logger.info(f"Abriendo URL: {url}")
             
@@ -97,23 +126,20 @@ class WebDriver:
             
             # Navegar a la URL
             self.driver.get(url)
+            status_code = self._response_status()
+            if status_code in THROTTLE_STATUS_CODES:
+                logger.error(f"El sitio está limitando las visitas (HTTP {status_code}): {url}")
+                return False
             logger.info("Página cargada exitosamente")
             
             # Esperar a que el botón esté presente y hacer clic
-            wait = WebDriverWait(self.driver, self.timeout)
-            button = wait.until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, self.button_selector))
-            )
-            
-            logger.info(f"Botón encontrado con selector: {self.button_selector}")
-            
-            # Hacer clic en el botón
-            button.click()
+            self._click_button()
             logger.info("Clic realizado exitosamente")
             
             # Esperar un momento para que la acción se complete
-            time.sleep(2)
+            time.sleep(self.post_click_wait)
             
+            success = True
             return True
             
         except TimeoutException:
@@ -136,6 +162,42 @@ class WebDriver:
                     logger.info("Driver cerrado")
                 except Exception as e:
                     logger.warning(f"Error cerrando driver: {str(e)}")
+            # Eliminar procesos que hayan sobrevivido al cierre y liberar el cupo
+            self.supervisor.release(self._browser_pid)
+            self.rate_limiter.record(url, success, status_code)
+    
+    def _click_button(self):
+        """
+        Espera a que el botón sea clickeable y hace clic en él.
+        
+        Raises:
+            TimeoutException: Si el botón no aparece dentro del tiempo de espera
+        """
+        wait = WebDriverWait(self.driver, self.timeout)
+        button = wait.until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, self.button_selector))
+        )
+        
+        logger.info(f"Botón encontrado con selector: {self.button_selector}")
+        
+        # Hacer clic en el botón
+        button.click()
+    
+    def _response_status(self) -> Optional[int]:
+        """
+        Obtiene el código HTTP de la navegación actual desde la Navigation Timing API.
+        
+        Returns:
+            Optional[int]: Código HTTP o None si el navegador no lo expone
+        """
+        try:
+            status = self.driver.execute_script(
+                "const nav = performance.getEntriesByType('navigation')[0];"
+                "return nav ? nav.responseStatus : null;"
+            )
+            return int(status) if status else None
+        except Exception:
+            return None
     
     def get_page_title(self, url: str) -> Optional[str]:
         """
@@ -147,6 +209,9 @@ class WebDriver:
         Returns:
             Optional[str]: Título de la página o None si hay error
         """
+        self.driver = None
+        self._browser_pid = None
+        self.supervisor.acquire()
         try:
             self.driver = self._setup_driver()
             self.driver.get(url)
@@ -159,4 +224,20 @@ class WebDriver:
             
         finally:
             if self.driver:
-                self.driver.quit() 
\ No newline at end of file
+                try:
+                    self.driver.quit()
+                except Exception as e:
+                    logger.warning(f"Error cerrando driver: {str(e)}")
+            self.supervisor.release(self._browser_pid)
+
+def create_web_driver() -> WebDriver:
+    """
+    Crea el driver web del motor configurado en BROWSER_ENGINE.
+    
+    Returns:
+        WebDriver: Driver Selenium o, con BROWSER_ENGINE=cdp, driver CDP directo
+    """
+    if get_settings().browser_engine == 'cdp':
+        from cdp_engine import CDPWebDriver
+        return CDPWebDriver()
+    return WebDriver()
@@ -4,17 +4,16 @@ Módulo para lectura de correos electrónicos
 Contiene funciones para conectar a IMAP, leer correos no leídos y extraer links.
 """
 
-import os
 import re
 import logging
-from typing import List, Optional
+from typing import Callable, List, Optional
 from imap_tools.mailbox import MailBox
 from imap_tools.query import AND
-from dotenv import load_dotenv
 import quopri
 from bs4 import BeautifulSoup
 from notifier import send_report_email
 from database import Database
+from settings import get_settings
 
 logger = logging.getLogger(__name__)
 
@@ -25,20 +24,29 @@ class EmailReader:
     
     def __init__(self):
         """
-        Inicializa el lector de correos con configuración desde variables de entorno.
+        Inicializa el lector de correos con la configuración centralizada.
         """
-        load_dotenv()
-        
-        self.imap_server = os.getenv('IMAP_SERVER', 'imap.gmail.com')
-        self.imap_port = int(os.getenv('IMAP_PORT', '993'))
-        self.email = os.getenv('EMAIL_ADDRESS')
-        self.password = os.getenv('EMAIL_PASSWORD')
-        self.sender_filter = os.getenv('SENDER_FILTER', 'netflix.com')
-        self.link_pattern = os.getenv('LINK_PATTERN', r'https?://[^\s<>"]+')
+        get_settings().subscribe(self.apply_settings)
         
         if not self.email or not self.password:
             raise ValueError("EMAIL_ADDRESS y EMAIL_PASSWORD deben estar configurados en .env")
     
+    def apply_settings(self, settings):
+        """
+        Aplica la configuración (al iniciar y en cada recarga).
+        """
+        self.imap_server = settings.imap_server
+        self.imap_port = settings.imap_port
+        self.email = settings.email_address
+        self.password = settings.email_password
+        self.sender_filter = settings.sender_filter
+        self.link_pattern = settings.link_pattern
+        self.fetch_chunk_size = settings.fetch_chunk_size
+        self.report_format = settings.report_format
+        self.report_compact_rows = settings.report_compact_rows
+        self.report_split_rows = settings.report_split_rows
+        self.db_path = settings.db_path
+    
     def get_unread_emails(self):
         """
         Obtiene los correos no leídos de la bandeja de entrada que coincidan con el filtro de remitente.
@@ -58,6 +66,65 @@ class EmailReader:
             logger.error(f"Error obteniendo correos no leídos: {str(e)}")
             return []
     
+    def iter_unread_emails(self, mailbox, owns: Callable[[str], bool] = None):
+        """
+        Recorre los correos no leídos descargándolos en bloques de tamaño fijo.
+        Los correos no se marcan como leídos al descargarlos: cada etapa del
+        proceso los marca al terminar con ellos, de modo que una ejecución
+        interrumpida deja sin leer los que quedaron pendientes.
+        El bloque se arma con los UID de la búsqueda porque imap-tools 1.5.0 solo
+        evalúa bulk como booleano y, con bulk=N, descargaría todos los correos de una vez.
+        Args:
+            mailbox: Conexión IMAP abierta
+            owns: Función que indica si un UID corresponde a este worker; los
+                demás no se descargan
+        Returns:
+            Iterator: Generador de objetos Email
+        """
+        # Tamaño fijo durante todo el recorrido aunque se recargue la configuración:
+        # cambiarlo entre bloques saltaría o repetiría UID
+        chunk_size = self.fetch_chunk_size
+        uids = [uid for uid in mailbox.uids('UNSEEN') if owns is None or owns(uid)]
+        for i in range(0, len(uids), chunk_size):
+            # UNSEEN de nuevo: otro worker pudo procesar el correo desde la búsqueda
+            criteria = AND(seen=False, uid=uids[i:i + chunk_size])
+            yield from mailbox.fetch(criteria, mark_seen=False, bulk=True)
+
+    def is_unseen(self, mailbox, uid: str) -> bool:
+        """
+        Consulta en el servidor si un correo sigue sin leer. El flag de la copia
+        descargada puede tener minutos de antigüedad.
+        Args:
+            mailbox: Conexión IMAP abierta
+            uid: UID IMAP del correo
+        Returns:
+            bool: True si el correo sigue sin leer
+        """
+        return bool(mailbox.uids(AND(uid=uid, seen=False)))
+
+    @staticmethod
+    def is_report_request(email) -> bool:
+        """
+        Indica si el correo contiene la palabra clave 'REPORTE'.
+        """
+        return "REPORTE" in email.subject.upper() or "REPORTE" in email.text.upper()
+
+    def mark_as_seen(self, mailbox, email) -> bool:
+        """
+        Marca un correo como leído usando una conexión IMAP ya abierta.
+        Args:
+            mailbox: Conexión IMAP abierta
+            email: Objeto de correo de imap-tools (o cualquier objeto con uid)
+        Returns:
+            bool: True si se marcó correctamente, False en caso contrario
+        """
+        try:
+            mailbox.flag(email.uid, '\\Seen', True)
+            return True
+        except Exception as e:
+            logger.error(f"No se pudo marcar como leído (UID: {email.uid}): {str(e)}")
+            return False
+
     def extract_link_from_email(self, email) -> Optional[str]:
         """
         Extrae el link del botón rojo de Netflix decodificando el HTML y usando BeautifulSoup.
@@ -110,32 +177,24 @@ class EmailReader:
             logger.error(f"Error marcando correo como leído: {str(e)}")
             return False 
 
-    def process_report_requests(self, emails):
+    def process_report_request(self, mailbox, email):
         """
-        Procesa solicitudes de reporte y responde con el archivo Excel si corresponde.
+        Responde una solicitud de reporte en el formato REPORT_FORMAT, con el resumen
+        HTML en el cuerpo, y marca el correo como leído.
         Args:
-            emails: lista de emails no leídos
+            mailbox: Conexión IMAP abierta
+            email: Correo con la palabra clave 'REPORTE'
         """
-        try:
-            with MailBox(self.imap_server).login(self.email, self.password) as mailbox:
-                for email in emails:
-                    logger.info(f"Revisando correo de {email.from_} con asunto: {email.subject}")
-                    if ("REPORTE" in email.subject.upper() or "REPORTE" in email.text.upper()):
-                        logger.info(f"Palabra clave 'REPORTE' detectada en el correo de {email.from_}")
-                        db = Database()
-                        excel_path = db.export_to_excel()
-                        if excel_path:
-                            send_report_email(email.from_, excel_path)
-                            logger.info(f"Reporte enviado a {email.from_}")
-                        else:
-                            logger.error("No se pudo generar el archivo Excel para el reporte.")
-                        # Marcar el correo como leído usando el flag estándar IMAP
-                        try:
-                            mailbox.flag(email.uid, '\\Seen', True)
-                            logger.info(f"Correo marcado como leído (UID: {email.uid}): {email.subject}")
-                        except Exception as e:
-                            logger.error(f"No se pudo marcar como leído: {str(e)}")
-                    else:
-                        logger.info(f"Correo de {email.from_} no contiene la palabra clave 'REPORTE'.")
-        except Exception as e:
-            logger.error(f"Error en process_report_requests: {str(e)}") 
\ No newline at end of file
+        logger.info(f"Palabra clave 'REPORTE' detectada en el correo de {email.from_}")
+        db = Database(self.db_path)
+        report_paths = db.export_report(self.report_format,
+                                        compact_rows=self.report_compact_rows,
+                                        split_rows=self.report_split_rows)
+        if report_paths or self.report_format == 'html':
+            send_report_email(email.from_, report_paths, db.build_summary_html())
+            logger.info(f"Reporte enviado a {email.from_}")
+        else:
+            logger.error("No se pudo generar el archivo del reporte.")
+        # Marcar el correo como leído usando el flag estándar IMAP
+        if self.mark_as_seen(mailbox, email):
+            logger.info(f"Correo marcado como leído (UID: {email.uid}): {email.subject}")
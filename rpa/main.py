@@ -9,14 +9,18 @@ import logging
 import time
 import shutil
 from datetime import datetime, date
-from dotenv import load_dotenv
 from imap_tools.mailbox import MailBox
 from imap_tools.query import AND
 
 # Importar módulos del sistema
 from email_reader import EmailReader
-from driver_web import WebDriver
+from driver_web import create_web_driver
 from database import Database
+from profiler import get_profiler
+from scheduler import DeadlineScheduler
+from settings import get_settings
+from coordination import get_coordinator
+from browser_supervisor import get_supervisor, BrowserUnavailable
 
 # Configurar logging
 logging.basicConfig(
@@ -88,77 +92,170 @@ def update_selenium_cleanup_flag(flag_path: str):
     with open(flag_path, 'w') as f:
         f.write(today)
 
+def finish_email(email, email_reader, coordinator, mailbox):
+    """
+    Marca un correo como leído y libera su reserva para los demás workers.
+    """
+    email_reader.mark_as_seen(mailbox, email)
+    coordinator.release_claim(email.uid)
+
+def classify_emails(emails, email_reader, coordinator, mailbox):
+    """
+    Etapa de clasificación: reserva cada correo para este worker, confirma en el
+    servidor que siga sin leer (la copia descargada puede tener minutos), atiende
+    las solicitudes de reporte (de cualquier remitente) y descarta los correos
+    ajenos al remitente filtrado. Solo entrega a la siguiente etapa los correos
+    con URL por procesar.
+    """
+    sender_filter = email_reader.sender_filter.lower()
+    for email in emails:
+        if not coordinator.claim(email.uid):
+            logger.info(f"Correo reservado por otro worker, se omite: {email.subject}")
+        elif not email_reader.is_unseen(mailbox, email.uid):
+            # Otro worker lo procesó y liberó su reserva después de la descarga
+            logger.info(f"Correo ya procesado por otro worker, se omite: {email.subject}")
+            coordinator.release_claim(email.uid)
+        elif email_reader.is_report_request(email):
+            email_reader.process_report_request(mailbox, email)
+            coordinator.release_claim(email.uid)
+        elif email.from_.lower() != sender_filter:
+            finish_email(email, email_reader, coordinator, mailbox)
+        else:
+            yield email
+
+def extract_links(emails, email_reader, scheduler, coordinator, mailbox):
+    """
+    Etapa de extracción: entrega un elemento de trabajo (sin el cuerpo del correo)
+    por cada link encontrado y marca como leídos los correos sin link válido.
+    """
+    for email in emails:
+        link = email_reader.extract_link_from_email(email)
+        if link:
+            logger.info(f"Link extraído: {link}")
+            yield scheduler.make_item(email, link)
+        else:
+            logger.info(f"Correo sin link válido, ignorando: {email.subject}")
+            # No se registra en la base de datos, solo se marca como leído e ignora
+            finish_email(email, email_reader, coordinator, mailbox)
+
+def execute_links(items, web_driver, db, email_reader, scheduler, coordinator, mailbox) -> int:
+    """
+    Etapa de ejecución: recorre los links en orden de fecha límite, descarta sin
+    abrir el navegador los vencidos, registra el resultado y marca el correo
+    como leído solo después de registrarlo. Si el host no tiene memoria o cupo
+    para un navegador, corta el ciclo dejando sin leer los correos pendientes.
+    
+    Returns:
+        int: Número de correos procesados
+    """
+    processed = 0
+    profiler = get_profiler()
+    for item, expired in scheduler.schedule(items):
+        # Punto seguro para empezar o terminar un perfilado pedido por SIGUSR1
+        profiler.checkpoint()
+        latency, slack = scheduler.queue_latency(item)
+        timing = f"espera {latency:.0f}s, margen {slack:.0f}s"
+        try:
+            if expired:
+                logger.warning(f"Link vencido, se omite ({timing}): {item.subject}")
+                scheduler.record_expired(item)
+                db.insert_failed_record(
+                    sender=item.sender,
+                    subject=item.subject,
+                    link=item.link,
+                    status="EXPIRED",
+                    observations=f"Link vencido antes de procesarse ({timing})"
+                )
+            else:
+                if scheduler.is_at_risk(item):
+                    logger.warning(f"Margen menor al tiempo estimado de ejecución "
+                                   f"({scheduler.service_time:.0f}s), se intenta igual: {item.subject}")
+                logger.info(f"Ejecutando link ({timing}): {item.subject}")
+                start = time.time()
+                # Abrir link y hacer clic en botón
+                success = web_driver.click_button_on_page(item.link)
+                elapsed = time.time() - start
+                scheduler.record_execution(item, elapsed)
+                
+                if success:
+                    db.insert_success_record(
+                        sender=item.sender,
+                        subject=item.subject,
+                        link=item.link,
+                        status="SUCCESS",
+                        observations=f"Procesado correctamente ({timing})",
+                        processing_time=elapsed
+                    )
+                else:
+                    db.insert_failed_record(
+                        sender=item.sender,
+                        subject=item.subject,
+                        link=item.link,
+                        status="FAILED",
+                        observations=f"Error al hacer clic en botón ({timing})",
+                        processing_time=elapsed
+                    )
+                logger.info(f"Correo procesado: {item.subject}")
+                
+        except BrowserUnavailable as e:
+            # Los correos quedan sin leer y sin reserva para el siguiente ciclo o para otro worker
+            coordinator.release_claim(item.uid)
+            pending = scheduler.drain()
+            for deferred in pending:
+                coordinator.release_claim(deferred.uid)
+            logger.warning(f"{str(e)}; se posponen {len(pending) + 1} links al siguiente ciclo")
+            break
+        except Exception as e:
+            logger.error(f"Error procesando correo {item.subject}: {str(e)}")
+            db.insert_failed_record(
+                sender=item.sender,
+                subject=item.subject,
+                link=item.link,
+                status="ERROR",
+                observations=f"Error: {str(e)}",
+                error_details=str(e)
+            )
+        finish_email(item, email_reader, coordinator, mailbox)
+        processed += 1
+    return processed
+
 def process_emails():
     """
     Función que procesa los correos electrónicos.
+    
+    Los correos se recorren como un flujo de generadores
+    (descarga por bloques → clasificación → extracción → ejecución): cada etapa
+    pide el siguiente correo solo cuando la posterior terminó con el anterior,
+    por lo que la memoria queda acotada por FETCH_CHUNK_SIZE y no por el
+    tamaño del atraso. Antes de la ejecución, los links se reordenan por fecha
+    límite dentro de una ventana de SCHEDULER_WINDOW elementos livianos.
+    
+    Con varios workers, cada uno descarga solo los UID que le corresponden según
+    los workers vivos y reserva cada correo antes de procesarlo.
+    
+    Los valores que definen el recorrido (FETCH_CHUNK_SIZE, SENDER_FILTER,
+    SCHEDULER_WINDOW) se fijan al empezarlo: una recarga de la configuración a
+    mitad de ciclo rige desde el siguiente.
     """
     try:
-        # Cargar variables de entorno
-        load_dotenv()
-        
         # Inicializar componentes
-        db = Database()
+        db = Database(get_settings().db_path)
         email_reader = EmailReader()
-        web_driver = WebDriver()
+        web_driver = create_web_driver()
+        scheduler = DeadlineScheduler()
+        coordinator = get_coordinator()
+        coordinator.refresh_workers()
         
-        # Leer todos los correos no leídos (sin filtrar remitente)
         with MailBox(email_reader.imap_server).login(email_reader.email, email_reader.password) as mailbox:
-            all_unread_emails = list(mailbox.fetch('(UNSEEN)', mark_seen=True, bulk=True))
-        # Procesar solicitudes de reporte para cualquier remitente
-        email_reader.process_report_requests(all_unread_emails)
-        # Leer solo los correos no leídos del remitente filtrado para procesar URLs
-        filtered_emails = [email for email in all_unread_emails if email.from_.lower() == email_reader.sender_filter.lower()]
-        emails_to_process = [email for email in filtered_emails if not ("REPORTE" in email.subject.upper() or "REPORTE" in email.text.upper())]
-        if not emails_to_process:
+            emails = email_reader.iter_unread_emails(mailbox, coordinator.owns)
+            to_process = classify_emails(emails, email_reader, coordinator, mailbox)
+            items = extract_links(to_process, email_reader, scheduler, coordinator, mailbox)
+            processed = execute_links(items, web_driver, db, email_reader, scheduler, coordinator, mailbox)
+        
+        if not processed:
             logger.info("No se encontraron correos no leídos para procesar")
             return
-        logger.info(f"Se encontraron {len(emails_to_process)} correos no leídos para procesar")
-        
-        # Procesar cada correo
-        for email in emails_to_process:
-            try:
-                # Extraer link del correo
-                link = email_reader.extract_link_from_email(email)
-                
-                if link:
-                    logger.info(f"Link extraído: {link}")
-                    
-                    # Abrir link y hacer clic en botón
-                    success = web_driver.click_button_on_page(link)
-                    
-                    if success:
-                        db.insert_success_record(
-                            sender=email.from_,
-                            subject=email.subject,
-                            link=link,
-                            status="SUCCESS",
-                            observations="Procesado correctamente"
-                        )
-                    else:
-                        db.insert_failed_record(
-                            sender=email.from_,
-                            subject=email.subject,
-                            link=link,
-                            status="FAILED",
-                            observations="Error al hacer clic en botón"
-                        )
-                    logger.info(f"Correo procesado: {email.subject}")
-                else:
-                    logger.info(f"Correo sin link válido, ignorando: {email.subject}")
-                    # No se registra en la base de datos, solo se marca como leído e ignora
-                    
-            except Exception as e:
-                logger.error(f"Error procesando correo {email.subject}: {str(e)}")
-                db.insert_failed_record(
-                    sender=email.from_,
-                    subject=email.subject,
-                    link="",
-                    status="ERROR",
-                    observations=f"Error: {str(e)}",
-                    error_details=str(e)
-                )
-        
-        logger.info("Proceso completado")
+        logger.info(f"Proceso completado: {processed} correos procesados ({scheduler.summary()})")
         
     except Exception as e:
         logger.error(f"Error general en el sistema: {str(e)}")
@@ -184,25 +281,63 @@ def update_cleanup_flag(flag_path: str):
 
 def main():
     """
-    Función principal que ejecuta el sistema RPA una sola vez (sin bucle infinito).
+    Función principal que ejecuta el sistema RPA.
+    
+    Con CYCLE_INTERVAL_SECONDS=0 (por defecto) ejecuta un solo ciclo; con un valor
+    mayor queda en ejecución repitiendo el ciclo con esa pausa, y recarga la
+    configuración al recibir SIGHUP o al cambiar .env o la tabla config.
+    """
+    settings = get_settings()
+    continuous = settings.cycle_interval_seconds > 0
+    logger.info(f"Iniciando sistema RPA en modo {'continuo' if continuous else 'ciclo único'}...")
+    settings.install_signal_handler()
+    if continuous:
+        settings.start_watching()
+    profiler = get_profiler()
+    profiler.install_signal_handler()
+    coordinator = get_coordinator()
+    coordinator.start()
+    
+    try:
+        while True:
+            with profiler.cycle():
+                run_cycle()
+            if settings.cycle_interval_seconds <= 0:
+                break
+            time.sleep(settings.cycle_interval_seconds)
+    finally:
+        coordinator.stop()
+
+def run_cycle():
+    """
+    Ejecuta un ciclo completo: mantenimiento periódico y procesamiento de correos.
+    El mantenimiento de la base de datos lo hace solo el líder del grupo de workers,
+    y la limpieza del cache de Selenium (local a cada host) el líder de cada host,
+    solo mientras ningún proceso del host tenga un navegador abierto.
     """
-    logger.info("Iniciando sistema RPA en modo ciclo único...")
     cleanup_flag = "db_cleanup.flag"
     selenium_cleanup_flag = "selenium_cleanup.flag"
-    db = Database()
+    db = Database(get_settings().db_path)
+    coordinator = get_coordinator()
     
-    # Limpieza automática de base de datos una vez al día
-    if should_run_cleanup(cleanup_flag):
-        eliminados = db.delete_old_records(days=30)
-        logger.info(f"Limpieza diaria: {eliminados} registros eliminados por antigüedad.")
-        update_cleanup_flag(cleanup_flag)
+    if coordinator.is_leader("db_maintenance"):
+        coordinator.purge_expired()
+        # Limpieza automática de base de datos una vez al día
+        if should_run_cleanup(cleanup_flag):
+            eliminados = db.delete_old_records(days=30)
+            logger.info(f"Limpieza diaria: {eliminados} registros eliminados por antigüedad.")
+            update_cleanup_flag(cleanup_flag)
     
     # Limpieza automática de Selenium cada 7 días
-    if should_cleanup_selenium(selenium_cleanup_flag):
-        cleanup_selenium_cache()
-        update_selenium_cleanup_flag(selenium_cleanup_flag)
+    if coordinator.is_leader(f"selenium_cleanup:{coordinator.hostname}") and should_cleanup_selenium(selenium_cleanup_flag):
+        with get_supervisor().host_idle() as idle:
+            if idle:
+                cleanup_selenium_cache()
+                update_selenium_cleanup_flag(selenium_cleanup_flag)
+            else:
+                logger.info("Limpieza del cache de Selenium pospuesta: hay navegadores en uso en el host")
     
     process_emails()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
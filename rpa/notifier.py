@@ -1,47 +1,160 @@
 import os
+import uuid
+import base64
 import smtplib
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
-from dotenv import load_dotenv
+from email.header import Header
+from email.utils import formatdate, make_msgid
+from settings import get_settings
 
-def send_report_email(to_email: str, attachment_path: str):
+# Bytes leídos por bloque al codificar un adjunto (múltiplo de 57: cada 57 bytes
+# producen exactamente una línea base64 de 76 caracteres)
+ATTACHMENT_BLOCK_SIZE = 57 * 1024
+# Bytes enviados al servidor SMTP por escritura
+SMTP_SEND_SIZE = 64 * 1024
+
+def send_report_email(to_email: str, attachment_path, html_summary: str = None):
     """
-    Envía el archivo Excel como adjunto al correo solicitado.
+    Envía el reporte como adjunto al correo solicitado.
+    Si los adjuntos superan REPORT_MAX_ATTACHMENT_MB se reparten en varios correos;
+    un archivo que por sí solo supere el límite no se adjunta y se indica en el cuerpo.
     Args:
         to_email: Correo destinatario
-        attachment_path: Ruta del archivo Excel
-    """
-    load_dotenv()
-    EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
-    EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
-    EMAIL_USER = os.getenv('EMAIL_USER')
-    EMAIL_PASS = os.getenv('EMAIL_PASS')
-
-    subject = "[RPA] Reporte solicitado"
-    body = "Adjunto encontrarás el reporte solicitado de procesos exitosos y fallidos."
-
-    msg = MIMEMultipart()
-    msg['From'] = EMAIL_USER
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-
-    if attachment_path and os.path.exists(attachment_path):
-        with open(attachment_path, 'rb') as f:
-            part = MIMEBase('application', 'octet-stream')
-            part.set_payload(f.read())
-            encoders.encode_base64(part)
-            part.add_header('Content-Disposition', f'attachment; filename="{os.path.basename(attachment_path)}"')
-            msg.attach(part)
+        attachment_path: Ruta del archivo del reporte, lista de rutas o None
+        html_summary: Resumen HTML para el cuerpo del correo (opcional)
+    """
+    settings = get_settings()
+    EMAIL_HOST = settings.email_host
+    EMAIL_PORT = settings.email_port
+    EMAIL_USER = settings.email_user
+    EMAIL_PASS = settings.email_pass
+    max_bytes = int(settings.report_max_attachment_mb * 1024 * 1024)
+
+    if isinstance(attachment_path, str):
+        attachment_path = [attachment_path]
+    paths = [path for path in (attachment_path or []) if path and os.path.exists(path)]
+    batches, too_big = _split_attachments(paths, max_bytes)
 
     try:
         server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT)
         server.starttls()
         server.login(EMAIL_USER, EMAIL_PASS)
-        server.sendmail(EMAIL_USER, to_email, msg.as_string())
+        for i, batch in enumerate(batches):
+            subject = "[RPA] Reporte solicitado"
+            if len(batches) > 1:
+                subject += f" ({i + 1}/{len(batches)})"
+            body, subtype = _report_body(html_summary if i == 0 else None, batch, too_big if i == 0 else [])
+            _send_streamed(server, EMAIL_USER, to_email, subject, body, subtype, batch)
         server.quit()
         print(f"Reporte enviado a {to_email}")
     except Exception as e:
-        print(f"Error enviando reporte: {str(e)}") 
\ No newline at end of file
+        print(f"Error enviando reporte: {str(e)}")
+
+def _split_attachments(paths: list, max_bytes: int) -> tuple:
+    """
+    Reparte los adjuntos en grupos cuyo tamaño total no supere max_bytes.
+    Returns:
+        tuple: (lista de grupos, archivos que superan el límite por sí solos).
+            Siempre hay al menos un grupo, aunque sea vacío.
+    """
+    batches, current, current_size, too_big = [], [], 0, []
+    for path in paths:
+        size = os.path.getsize(path)
+        if size > max_bytes:
+            too_big.append(path)
+            continue
+        if current and current_size + size > max_bytes:
+            batches.append(current)
+            current, current_size = [], 0
+        current.append(path)
+        current_size += size
+    if current or not batches:
+        batches.append(current)
+    return batches, too_big
+
+def _report_body(html_summary: str, attachments: list, too_big: list) -> tuple:
+    """
+    Construye el cuerpo del correo del reporte.
+    Returns:
+        tuple: (texto del cuerpo, subtipo MIME 'plain' o 'html')
+    """
+    notes = [f"El archivo {os.path.basename(path)} supera el tamaño máximo de adjunto y no se envió."
+             for path in too_big]
+    if html_summary:
+        extra = "".join(f"<p>{note}</p>" for note in notes)
+        return html_summary.replace("</body>", f"{extra}</body>"), 'html'
+    if attachments:
+        body = "Adjunto encontrarás el reporte solicitado de procesos exitosos y fallidos."
+    else:
+        body = "No se generó ningún archivo de reporte."
+    return "\n".join([body] + notes), 'plain'
+
+def _iter_message(from_email: str, to_email: str, subject: str, body: str, subtype: str, attachments: list):
+    """
+    Genera el mensaje MIME línea por línea, codificando los adjuntos en base64 por
+    bloques para no cargar los archivos completos en memoria.
+    """
+    boundary = f"=_rpa_{uuid.uuid4().hex}"
+    headers = [
+        f"From: {from_email}",
+        f"To: {to_email}",
+        f"Subject: {Header(subject, 'utf-8').encode()}",
+        f"Date: {formatdate(localtime=True)}",
+        f"Message-ID: {make_msgid()}",
+        "MIME-Version: 1.0",
+        f'Content-Type: multipart/mixed; boundary="{boundary}"',
+        "",
+    ]
+    for header in headers:
+        yield header.encode('utf-8') + b"\r\n"
+
+    part = MIMEText(body, subtype, 'utf-8')
+    yield f"--{boundary}\r\n".encode()
+    for line in part.as_string().splitlines():
+        yield line.encode('utf-8') + b"\r\n"
+
+    for path in attachments:
+        filename = os.path.basename(path)
+        yield f"--{boundary}\r\n".encode()
+        yield f'Content-Type: application/octet-stream; name="{filename}"\r\n'.encode('utf-8')
+        yield b"Content-Transfer-Encoding: base64\r\n"
+        yield f'Content-Disposition: attachment; filename="{filename}"\r\n\r\n'.encode('utf-8')
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(ATTACHMENT_BLOCK_SIZE)
+                if not block:
+                    break
+                yield base64.encodebytes(block).replace(b"\n", b"\r\n")
+
+    yield f"--{boundary}--\r\n".encode()
+
+def _send_streamed(server: smtplib.SMTP, from_email: str, to_email: str, subject: str,
+                   body: str, subtype: str, attachments: list):
+    """
+    Envía un mensaje por SMTP escribiéndolo al socket a medida que se genera,
+    en lugar de construirlo completo en memoria como hace sendmail().
+    """
+    server.ehlo_or_helo_if_needed()
+    code, resp = server.mail(from_email)
+    if code != 250:
+        raise smtplib.SMTPSenderRefused(code, resp, from_email)
+    code, resp = server.rcpt(to_email)
+    if code not in (250, 251):
+        raise smtplib.SMTPRecipientsRefused({to_email: (code, resp)})
+    code, resp = server.docmd("DATA")
+    if code != 354:
+        raise smtplib.SMTPDataError(code, resp)
+
+    buffer = bytearray()
+    for chunk in _iter_message(from_email, to_email, subject, body, subtype, attachments):
+        # Dot-stuffing (RFC 5321 4.5.2): las líneas que empiezan con '.' se duplican
+        for line in chunk.splitlines(keepends=True):
+            buffer += (b"." + line) if line.startswith(b".") else line
+        if len(buffer) >= SMTP_SEND_SIZE:
+            server.send(bytes(buffer))
+            buffer.clear()
+    buffer += b".\r\n"
+    server.send(bytes(buffer))
+    code, resp = server.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
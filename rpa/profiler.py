@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Módulo de perfilado bajo demanda
+Envuelve un ciclo del sistema RPA en cProfile y tracemalloc y guarda los resultados
+en un directorio de perfiles. Se activa con la opción RPA_PROFILE=1 o enviando
+SIGUSR1 al proceso.
+
+Uso para ver el resumen del último perfil:
+    python3 rpa/profiler.py [archivo.prof]
+"""
+
+import os
+import sys
+import glob
+import cProfile
+import pstats
+import signal
+import logging
+import threading
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Optional
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+class CycleProfiler:
+    """
+    Clase para perfilar CPU y memoria de un ciclo de procesamiento.
+    """
+
+    def __init__(self):
+        """
+        Inicializa el perfilador con la configuración centralizada.
+        """
+        self.enabled = False
+        self._configured = None
+        self._profile = None
+        self._in_cycle = False
+        self._started_tracemalloc = False
+        self._toggle_requested = threading.Event()
+        get_settings().subscribe(self.apply_settings)
+
+    def apply_settings(self, settings):
+        """
+        Aplica la configuración (al iniciar y en cada recarga). RPA_PROFILE solo
+        cambia el estado si cambió su valor, para no deshacer un cambio hecho por señal.
+        """
+        self.profiles_dir = settings.profiles_dir
+        self.keep = settings.profile_keep
+        self.top = settings.profile_top
+        if settings.rpa_profile != self._configured:
+            self._configured = settings.rpa_profile
+            self.enabled = settings.rpa_profile
+
+    def install_signal_handler(self):
+        """
+        Registra SIGUSR1 para alternar el perfilado sin reiniciar el proceso. El
+        manejador solo deja el cambio pendiente; se aplica en el siguiente punto
+        seguro (checkpoint), y si llega durante un ciclo el perfilado empieza o
+        termina ahí.
+        """
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self._toggle_requested.set())
+
+    def checkpoint(self):
+        """
+        Aplica el cambio pedido por SIGUSR1, si hay uno pendiente. Se llama desde el
+        hilo principal entre operaciones (al empezar y terminar el ciclo y entre
+        links), nunca dentro del manejador de la señal.
+        """
+        if not self._toggle_requested.is_set():
+            return
+        self._toggle_requested.clear()
+        self.enabled = not self.enabled
+        logger.info(f"Perfilado {'activado' if self.enabled else 'desactivado'} por señal")
+        if self.enabled and self._in_cycle and not self._profile:
+            self._start()
+        elif not self.enabled and self._profile:
+            self._stop()
+
+    def _start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def _stop(self) -> Optional[str]:
+        """
+        Detiene el perfilado y escribe el archivo .prof y el reporte de memoria.
+
+        Returns:
+            Optional[str]: Ruta del archivo .prof o None si hubo error
+        """
+        profile, self._profile = self._profile, None
+        profile.disable()
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+            os.makedirs(self.profiles_dir, exist_ok=True)
+            # Microsegundos y PID: dos ciclos pueden terminar en el mismo segundo
+            stamp = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{os.getpid()}"
+            prof_path = os.path.join(self.profiles_dir, f"cycle_{stamp}.prof")
+            mem_path = os.path.join(self.profiles_dir, f"cycle_{stamp}_mem.txt")
+
+            profile.dump_stats(prof_path)
+            with open(mem_path, 'w') as f:
+                f.write(f"Memoria actual: {current / 1024:.1f} KiB | Pico: {peak / 1024:.1f} KiB\n")
+                f.write(f"Top {self.top} asignaciones por línea:\n")
+                for stat in snapshot.statistics('lineno')[:self.top]:
+                    f.write(f"{stat}\n")
+
+            logger.info(f"Perfil guardado: {prof_path} (pico de memoria {peak / 1024 / 1024:.1f} MiB)")
+            self._apply_retention()
+            return prof_path
+        except Exception as e:
+            logger.error(f"Error guardando perfil: {str(e)}")
+            return None
+
+    def _apply_retention(self):
+        """
+        Elimina los perfiles más antiguos cuando se supera el límite PROFILE_KEEP.
+        """
+        profiles = sorted(glob.glob(os.path.join(self.profiles_dir, 'cycle_*.prof')))
+        for prof_path in profiles[:max(0, len(profiles) - self.keep)]:
+            for path in (prof_path, prof_path[:-len('.prof')] + '_mem.txt'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    @contextmanager
+    def cycle(self):
+        """
+        Contexto que perfila el bloque si el perfilado está activo.
+        """
+        self.checkpoint()
+        self._in_cycle = True
+        if self.enabled:
+            self._start()
+        try:
+            yield
+        finally:
+            self.checkpoint()
+            self._in_cycle = False
+            if self._profile:
+                self._stop()
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+def get_profiler() -> CycleProfiler:
+    """
+    Obtiene el perfilador compartido del proceso.
+    """
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = CycleProfiler()
+        return _profiler
+
+def latest_profile(profiles_dir: str = None) -> Optional[str]:
+    """
+    Obtiene la ruta del perfil más reciente.
+    """
+    profiles_dir = profiles_dir or get_settings().profiles_dir
+    profiles = sorted(glob.glob(os.path.join(profiles_dir, 'cycle_*.prof')))
+    return profiles[-1] if profiles else None
+
+def print_summary(prof_path: str, top: int = 25):
+    """
+    Muestra las funciones con mayor tiempo acumulado y el reporte de memoria asociado.
+    """
+    stats = pstats.Stats(prof_path)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(top)
+    mem_path = prof_path[:-len('.prof')] + '_mem.txt'
+    if os.path.exists(mem_path):
+        with open(mem_path, 'r') as f:
+            print(f.read())
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else latest_profile()
+    if not path:
+        print("No se encontraron perfiles")
+        sys.exit(1)
+    print_summary(path, get_settings().profile_top)
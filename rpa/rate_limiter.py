@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Módulo de limitación de visitas por dominio
+Aplica un token bucket por host antes de abrir cada página y ajusta la tasa de forma
+adaptativa: la reduce cuando suben los errores o llegan respuestas 429/503 y la
+recupera gradualmente mientras las visitas salen bien.
+
+El estado de cada host (tasa, tokens y resultados recientes) se guarda en la base de
+datos compartida, de modo que la reducción sobrevive entre ejecuciones y todos los
+workers consumen del mismo bucket. Cada lectura y actualización se hace dentro de una
+transacción BEGIN IMMEDIATE, que reserva la escritura de la base como los leases de
+coordinación. Los tiempos usan el reloj de cada host (deben estar sincronizados).
+"""
+
+import time
+import sqlite3
+import threading
+import logging
+from collections import deque
+from typing import Callable, Optional
+from urllib.parse import urlparse
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Códigos HTTP que indican que el sitio está limitando las visitas
+THROTTLE_STATUS_CODES = (429, 503)
+
+class TokenBucket:
+    """
+    Token bucket con tasa ajustable.
+    """
+
+    def __init__(self, rate: float, burst: int, tokens: float = None, updated: float = None):
+        """
+        Args:
+            rate: Tokens por segundo
+            burst: Capacidad máxima del bucket
+            tokens: Tokens disponibles (por defecto, el bucket lleno)
+            updated: Momento (epoch) de la última recarga
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst if tokens is None else tokens)
+        self.updated = time.time() if updated is None else updated
+
+    def _refill(self):
+        now = time.time()
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_consume(self) -> float:
+        """
+        Consume un token si hay disponible.
+
+        Returns:
+            float: 0 si se consumió, o los segundos a esperar hasta el próximo token
+        """
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def drain(self):
+        """
+        Vacía el bucket para forzar una pausa antes de la próxima visita.
+        """
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+class DomainRateLimiter:
+    """
+    Clase para limitar y adaptar la tasa de visitas de cada dominio.
+    """
+
+    def __init__(self):
+        """
+        Inicializa el limitador con la configuración centralizada y crea la tabla de estado.
+        """
+        settings = get_settings()
+        self.db_path = settings.coordination_db_path or settings.db_path
+        settings.subscribe(self.apply_settings)
+        self._create_table()
+
+    def apply_settings(self, settings):
+        """
+        Aplica la configuración (al iniciar y en cada recarga). Los buckets guardados
+        se ajustan a los nuevos límites al leerlos, sin perder la reducción adaptativa en curso.
+        """
+        self.steady_rate = settings.rate_limit_per_second
+        self.burst = settings.rate_limit_burst
+        self.min_rate = settings.rate_limit_min_per_second
+        self.error_threshold = settings.rate_limit_error_threshold
+        self.window = settings.rate_limit_window
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit: las transacciones se abren explícitamente con BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _create_table(self):
+        """
+        Crea la tabla de estado de los buckets si no existe.
+        """
+        connection = self._connect()
+        try:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    host TEXT PRIMARY KEY,
+                    rate REAL NOT NULL,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    outcomes TEXT NOT NULL DEFAULT ''
+                )
+            ''')
+        finally:
+            connection.close()
+
+    def _host(self, url: str) -> str:
+        return (urlparse(url).hostname or '').lower()
+
+    def _update(self, host: str, change: Callable, default=None):
+        """
+        Lee el bucket del host, aplica `change(bucket, outcomes)` y guarda el resultado,
+        todo dentro de una transacción que excluye a los demás procesos.
+
+        Args:
+            host: Dominio
+            change: Función que modifica el bucket y los resultados recientes
+            default: Valor a devolver si la base de datos falla
+        Returns:
+            Lo que devuelva `change`
+        """
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                'SELECT rate, tokens, updated_at, outcomes FROM rate_limits WHERE host = ?', (host,)
+            ).fetchone()
+            if row:
+                rate = min(max(row[0], self.min_rate), self.steady_rate)
+                bucket = TokenBucket(rate, self.burst, min(row[1], self.burst), row[2])
+                outcomes = deque((flag == '1' for flag in row[3]), maxlen=self.window)
+            else:
+                bucket = TokenBucket(self.steady_rate, self.burst)
+                outcomes = deque(maxlen=self.window)
+            result = change(bucket, outcomes)
+            connection.execute('''
+                INSERT OR REPLACE INTO rate_limits (host, rate, tokens, updated_at, outcomes)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (host, bucket.rate, bucket.tokens, bucket.updated,
+                  ''.join('1' if ok else '0' for ok in outcomes)))
+            connection.execute('COMMIT')
+            return result
+        except sqlite3.Error as e:
+            logger.error(f"Error actualizando la tasa de visitas de {host}: {str(e)}")
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            return default
+        finally:
+            connection.close()
+
+    def acquire(self, url: str):
+        """
+        Bloquea hasta que el dominio de la URL tenga un token disponible.
+
+        Args:
+            url: URL que se va a visitar
+        """
+        host = self._host(url)
+        while True:
+            wait = self._update(host, lambda bucket, outcomes: bucket.try_consume(), default=0.0)
+            if wait <= 0:
+                return
+            logger.info(f"Limitando visitas a {host}: esperando {wait:.1f}s")
+            time.sleep(wait)
+
+    def record(self, url: str, success: bool, status_code: Optional[int] = None):
+        """
+        Registra el resultado de una visita y ajusta la tasa del dominio.
+
+        Una respuesta 429/503 reduce la tasa a la mitad y vacía el bucket; una tasa
+        de errores por encima del umbral en la ventana reciente la reduce un 25%;
+        mientras no haya problemas se recupera un 10% de la tasa configurada por visita.
+
+        Args:
+            url: URL visitada
+            success: Si la visita terminó correctamente
+            status_code: Código HTTP de la respuesta, si se conoce
+        """
+        host = self._host(url)
+
+        def adapt(bucket, outcomes):
+            outcomes.append(success)
+            error_rate = outcomes.count(False) / len(outcomes)
+            previous = bucket.rate
+            if status_code in THROTTLE_STATUS_CODES:
+                bucket.rate = max(self.min_rate, bucket.rate * 0.5)
+                bucket.drain()
+            elif not success and len(outcomes) >= min(3, self.window) and error_rate > self.error_threshold:
+                bucket.rate = max(self.min_rate, bucket.rate * 0.75)
+            elif success and error_rate <= self.error_threshold:
+                bucket.rate = min(self.steady_rate, bucket.rate + self.steady_rate * 0.1)
+            return previous, bucket.rate, error_rate
+
+        result = self._update(host, adapt)
+        if result and result[1] < result[0]:
+            previous, rate, error_rate = result
+            logger.warning(f"Reduciendo tasa de visitas a {host}: {previous:.3f} -> {rate:.3f}/s "
+                           f"(errores {error_rate:.0%}, HTTP {status_code})")
+
+    def get_rate(self, url: str) -> float:
+        """
+        Obtiene la tasa actual (visitas por segundo) del dominio de la URL.
+        """
+        return self._update(self._host(url), lambda bucket, outcomes: bucket.rate, default=self.steady_rate)
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> DomainRateLimiter:
+    """
+    Obtiene el limitador compartido del proceso.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = DomainRateLimiter()
+        return _rate_limiter
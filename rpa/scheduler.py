@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Módulo de planificación por fecha límite
+Ordena los links extraídos por su vencimiento (fecha del correo + LINK_TTL_SECONDS),
+atendiendo primero el que vence antes, y descarta sin abrir el navegador los que ya
+vencieron. La estimación del tiempo de ejecución solo sirve para advertir los links
+que probablemente terminen tarde: esos se intentan igual.
+"""
+
+import time
+import heapq
+import itertools
+import logging
+from typing import Iterable, Iterator, Tuple
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+class WorkItem:
+    """
+    Datos mínimos de un correo pendiente de ejecución. Se separan del objeto de
+    imap-tools para no retener el cuerpo MIME mientras espera en la cola.
+    """
+
+    __slots__ = ('uid', 'sender', 'subject', 'link', 'received_at', 'deadline')
+
+    def __init__(self, email, link: str, link_ttl: int):
+        """
+        Args:
+            email: Objeto de correo de imap-tools
+            link: Link extraído del correo
+            link_ttl: Segundos de validez del link desde el envío del correo
+        """
+        self.uid = email.uid
+        self.sender = email.from_
+        self.subject = email.subject
+        self.link = link
+        self.received_at = self._email_timestamp(email)
+        self.deadline = self.received_at + link_ttl
+
+    @staticmethod
+    def _email_timestamp(email) -> float:
+        """
+        Obtiene la fecha de envío del correo como timestamp. imap-tools devuelve
+        1900-01-01 cuando no puede interpretar la cabecera Date; en ese caso se
+        usa la hora actual.
+        """
+        try:
+            if email.date and email.date.year > 1900:
+                return email.date.timestamp()
+        except Exception:
+            pass
+        return time.time()
+
+class DeadlineScheduler:
+    """
+    Clase para ordenar la ejecución de links por fecha límite (EDF).
+    """
+
+    def __init__(self):
+        """
+        Inicializa el planificador con la configuración centralizada.
+        """
+        settings = get_settings()
+        # Estimación (media móvil) del tiempo que tarda en ejecutarse un link
+        self.service_time = settings.expected_link_seconds
+        settings.subscribe(self.apply_settings)
+        self._counter = itertools.count()
+        self._window = []
+        self.stats = {'on_time': 0, 'late': 0, 'expired': 0, 'max_latency': 0.0}
+
+    def apply_settings(self, settings):
+        """
+        Aplica la configuración (al iniciar y en cada recarga). Los elementos ya
+        creados conservan la fecha límite calculada con el TTL anterior.
+        """
+        self.link_ttl = settings.link_ttl_seconds
+        self.window = settings.scheduler_window
+
+    def make_item(self, email, link: str) -> WorkItem:
+        """
+        Crea el elemento de trabajo de un correo con su fecha límite.
+        """
+        return WorkItem(email, link, self.link_ttl)
+
+    def schedule(self, items: Iterable[WorkItem]) -> Iterator[Tuple[WorkItem, bool]]:
+        """
+        Entrega los elementos en orden de fecha límite más próxima.
+
+        Mantiene en memoria como máximo SCHEDULER_WINDOW elementos (el valor al
+        iniciar el recorrido): el orden es exacto dentro de esa ventana y el resto
+        sigue sin leer en el buzón.
+
+        Args:
+            items: Elementos de trabajo en el orden de descarga
+        Returns:
+            Iterator: Pares (elemento, vencido). Un elemento vencido ya pasó
+                su fecha límite.
+        """
+        heap = self._window = []
+        window = self.window
+        items = iter(items)
+        exhausted = False
+        while True:
+            while not exhausted and len(heap) < window:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                heapq.heappush(heap, (item.deadline, next(self._counter), item))
+            if not heap:
+                return
+            _, _, item = heapq.heappop(heap)
+            yield item, self.is_expired(item)
+
+    def drain(self) -> list:
+        """
+        Vacía la ventana del ciclo y devuelve los elementos que quedaban sin entregar,
+        para liberarlos cuando la ejecución se corta antes de agotar el flujo.
+
+        Returns:
+            list: Elementos pendientes, en orden de fecha límite
+        """
+        pending = [item for _, _, item in sorted(self._window)]
+        self._window.clear()
+        return pending
+
+    def is_expired(self, item: WorkItem) -> bool:
+        """
+        Indica si el link ya pasó su fecha límite.
+        """
+        return time.time() > item.deadline
+
+    def is_at_risk(self, item: WorkItem) -> bool:
+        """
+        Indica si, según el tiempo estimado de ejecución, el link probablemente
+        venza antes de terminar de procesarse. Es solo una advertencia: la
+        estimación puede superar el margen real de un link todavía válido.
+        """
+        return time.time() + self.service_time > item.deadline
+
+    def queue_latency(self, item: WorkItem) -> Tuple[float, float]:
+        """
+        Calcula la espera en cola del correo y el margen restante hasta su fecha
+        límite, y actualiza la mayor espera observada en el ciclo.
+
+        Returns:
+            Tuple[float, float]: (segundos desde el envío, segundos hasta el vencimiento)
+        """
+        now = time.time()
+        latency = now - item.received_at
+        self.stats['max_latency'] = max(self.stats['max_latency'], latency)
+        return latency, item.deadline - now
+
+    def record_execution(self, item: WorkItem, elapsed: float):
+        """
+        Registra un link ejecutado y actualiza la estimación del tiempo de ejecución.
+
+        Args:
+            item: Elemento ejecutado
+            elapsed: Segundos que tomó la ejecución
+        """
+        self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+        if time.time() <= item.deadline:
+            self.stats['on_time'] += 1
+        else:
+            self.stats['late'] += 1
+
+    def record_expired(self, item: WorkItem):
+        """
+        Registra un link descartado por vencimiento.
+        """
+        self.stats['expired'] += 1
+
+    def summary(self) -> str:
+        """
+        Resume los resultados de la planificación del ciclo.
+        """
+        return (f"a tiempo: {self.stats['on_time']}, tarde: {self.stats['late']}, "
+                f"vencidos: {self.stats['expired']}, mayor espera: {self.stats['max_latency']:.0f}s")
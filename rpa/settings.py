@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Módulo de configuración centralizada
+Construye una única configuración validada al iniciar, combinando en orden de
+prioridad creciente el archivo .env, la tabla config de la base de datos y las
+variables de entorno. En procesos de larga duración se recarga al recibir SIGHUP o
+al cambiar el archivo .env o la tabla config, y avisa a los componentes suscritos
+para que se reconfiguren sin reiniciar.
+"""
+
+import os
+import re
+import signal
+import sqlite3
+import weakref
+import threading
+import logging
+from typing import Callable
+from dotenv import dotenv_values, find_dotenv
+from database import REPORT_FORMATS
+
+logger = logging.getLogger(__name__)
+
+def _parse_bool(value: str) -> bool:
+    value = str(value).strip().lower()
+    if value in ('1', 'true', 'yes', 'si', 'sí', 'on'):
+        return True
+    if value in ('0', 'false', 'no', 'off', ''):
+        return False
+    raise ValueError("se esperaba un booleano")
+
+def _positive(cast):
+    def parse(value):
+        result = cast(value)
+        if result <= 0:
+            raise ValueError("debe ser mayor que cero")
+        return result
+    return parse
+
+def _non_negative(cast):
+    def parse(value):
+        result = cast(value)
+        if result < 0:
+            raise ValueError("no puede ser negativo")
+        return result
+    return parse
+
+def _regex(value: str) -> str:
+    re.compile(value)
+    return value
+
+def _choice(*options):
+    def parse(value):
+        value = str(value).strip().lower()
+        if value not in options:
+            raise ValueError(f"debe ser uno de {', '.join(options)}")
+        return value
+    return parse
+
+# (clave, conversión/validación, valor por defecto). El atributo es la clave en minúsculas.
+SETTINGS_SCHEMA = (
+    # Correo entrante (IMAP)
+    ('IMAP_SERVER', str, 'imap.gmail.com'),
+    ('IMAP_PORT', _positive(int), 993),
+    ('EMAIL_ADDRESS', str, None),
+    ('EMAIL_PASSWORD', str, None),
+    ('SENDER_FILTER', str, 'netflix.com'),
+    ('LINK_PATTERN', _regex, r'https?://[^\s<>"]+'),
+    ('FETCH_CHUNK_SIZE', _positive(int), 20),
+    # Correo saliente (SMTP) y reportes
+    ('EMAIL_HOST', str, 'smtp.gmail.com'),
+    ('EMAIL_PORT', _positive(int), 587),
+    ('EMAIL_USER', str, None),
+    ('EMAIL_PASS', str, None),
+    ('REPORT_FORMAT', _choice(*REPORT_FORMATS), 'xlsx'),
+    ('REPORT_COMPACT_ROWS', _positive(int), 20000),
+    ('REPORT_SPLIT_ROWS', _positive(int), 200000),
+    ('REPORT_MAX_ATTACHMENT_MB', _positive(float), 20.0),
+    # Navegador
+    ('BROWSER_ENGINE', _choice('selenium', 'cdp'), 'selenium'),
+    ('CHROME_BINARY', str, None),
+    ('BUTTON_SELECTOR', str, 'button'),
+    ('TIMEOUT_SECONDS', _positive(int), 10),
+    ('BROWSER_MAX_RSS_MB', _positive(int), 700),
+    ('BROWSER_MAX_SECONDS', _positive(int), 120),
+    ('BROWSER_EXPECTED_MB', _positive(int), 350),
+    ('MAX_BROWSERS', _positive(int), 2),
+    ('BROWSER_WAIT_SECONDS', _positive(float), 60.0),
+    ('WATCHDOG_INTERVAL_SECONDS', _positive(float), 2.0),
+    ('BROWSER_STATE_PATH', str, 'browser_pids.json'),
+    # Limitación de visitas
+    ('RATE_LIMIT_PER_SECOND', _positive(float), 0.2),
+    ('RATE_LIMIT_BURST', _positive(int), 3),
+    ('RATE_LIMIT_MIN_PER_SECOND', _positive(float), 0.02),
+    ('RATE_LIMIT_ERROR_THRESHOLD', _non_negative(float), 0.3),
+    ('RATE_LIMIT_WINDOW', _positive(int), 10),
+    # Planificación de links
+    ('LINK_TTL_SECONDS', _positive(int), 900),
+    ('SCHEDULER_WINDOW', _positive(int), 200),
+    ('EXPECTED_LINK_SECONDS', _non_negative(float), 15.0),
+    # Perfilado
+    ('RPA_PROFILE', _parse_bool, False),
+    ('PROFILES_DIR', str, 'profiles'),
+    ('PROFILE_KEEP', _positive(int), 20),
+    ('PROFILE_TOP', _positive(int), 25),
+    # Sistema
+    ('DB_PATH', str, 'rpa_database.db'),
+    ('CYCLE_INTERVAL_SECONDS', _non_negative(int), 0),
+    ('SETTINGS_WATCH_SECONDS', _positive(float), 5.0),
+    # Coordinación entre nodos
+    ('NODE_ID', str, None),
+    ('COORDINATION_DB_PATH', str, None),
+    ('LEASE_TTL_SECONDS', _positive(int), 60),
+)
+
+SETTINGS_KEYS = {key for key, _, _ in SETTINGS_SCHEMA}
+
+class Settings:
+    """
+    Configuración tipada del sistema RPA, compartida por todos los módulos.
+    """
+
+    def __init__(self, env_path: str = None):
+        """
+        Carga y valida la configuración.
+
+        Args:
+            env_path: Ruta del archivo .env (por defecto se busca como load_dotenv)
+        Raises:
+            ValueError: Si algún valor no es válido
+        """
+        self.env_path = env_path or find_dotenv() or '.env'
+        # Las variables de entorno no cambian durante la vida del proceso
+        self._environ = dict(os.environ)
+        self._lock = threading.RLock()
+        self._callbacks = []
+        self._reload_requested = threading.Event()
+        self._stop_event = threading.Event()
+        self._watcher = None
+        self._apply(self._load())
+        self._fingerprint = self._source_fingerprint()
+
+    def _load(self) -> dict:
+        """
+        Lee las tres fuentes y devuelve los valores validados.
+
+        Raises:
+            ValueError: Si algún valor no es válido
+        """
+        raw = {key: value for key, value in dotenv_values(self.env_path).items()
+               if key in SETTINGS_KEYS and value is not None}
+        # La ubicación de la base de datos no puede venir de la propia base de datos
+        db_path = self._environ.get('DB_PATH', raw.get('DB_PATH', 'rpa_database.db'))
+        raw.update(self._load_db_config(db_path))
+        raw.update({key: value for key, value in self._environ.items() if key in SETTINGS_KEYS})
+
+        values = {}
+        errors = []
+        for key, parse, default in SETTINGS_SCHEMA:
+            if key not in raw:
+                values[key.lower()] = default
+                continue
+            try:
+                values[key.lower()] = parse(raw[key])
+            except Exception as e:
+                errors.append(f"{key}={raw[key]!r}: {str(e)}")
+        if errors:
+            raise ValueError(f"Configuración inválida: {'; '.join(errors)}")
+        return values
+
+    def _load_db_config(self, db_path: str) -> dict:
+        """
+        Lee la tabla config de la base de datos (escrita con Database.update_config).
+        """
+        if not os.path.exists(db_path):
+            return {}
+        try:
+            connection = sqlite3.connect(db_path)
+            try:
+                rows = connection.execute('SELECT key, value FROM config').fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo leer la tabla config: {str(e)}")
+            return {}
+        return {key: value for key, value in rows if key in SETTINGS_KEYS and value is not None}
+
+    def _apply(self, values: dict) -> list:
+        """
+        Reemplaza los valores actuales y devuelve las claves que cambiaron.
+        """
+        with self._lock:
+            changed = [key for key, value in values.items() if getattr(self, key, object()) != value]
+            self.__dict__.update(values)
+        return changed
+
+    def _source_fingerprint(self) -> tuple:
+        """
+        Identifica el estado actual de las fuentes para detectar cambios.
+        """
+        try:
+            env_mtime = os.path.getmtime(self.env_path)
+        except OSError:
+            env_mtime = None
+        db_version = None
+        if os.path.exists(self.db_path):
+            try:
+                connection = sqlite3.connect(self.db_path)
+                try:
+                    db_version = connection.execute(
+                        'SELECT COUNT(*), MAX(updated_at) FROM config').fetchone()
+                finally:
+                    connection.close()
+            except sqlite3.Error:
+                db_version = None
+        return env_mtime, db_version
+
+    def subscribe(self, callback: Callable):
+        """
+        Registra una función a llamar con esta configuración cada vez que cambie,
+        y la llama de inmediato. Los métodos se guardan como referencias débiles,
+        así un componente descartado no queda retenido por la suscripción.
+
+        Args:
+            callback: Función o método que recibe la configuración
+        """
+        ref = weakref.WeakMethod(callback) if hasattr(callback, '__self__') else (lambda: callback)
+        with self._lock:
+            # Descartar las suscripciones de componentes ya liberados (se crean en cada ciclo)
+            self._callbacks = [existing for existing in self._callbacks if existing() is not None]
+            self._callbacks.append(ref)
+        callback(self)
+
+    def reload(self) -> bool:
+        """
+        Vuelve a leer las fuentes y reconfigura los componentes suscritos. Si la
+        nueva configuración no es válida se conserva la anterior.
+
+        Returns:
+            bool: True si la configuración cambió
+        """
+        self._fingerprint = self._source_fingerprint()
+        try:
+            values = self._load()
+        except ValueError as e:
+            logger.error(f"{str(e)}. Se mantiene la configuración anterior")
+            return False
+        changed = self._apply(values)
+        if not changed:
+            return False
+        logger.info(f"Configuración recargada, cambios en: {', '.join(changed)}")
+        with self._lock:
+            self._callbacks = [ref for ref in self._callbacks if ref() is not None]
+            callbacks = [ref() for ref in self._callbacks]
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error(f"Error aplicando la nueva configuración: {str(e)}")
+        return True
+
+    def install_signal_handler(self):
+        """
+        Registra SIGHUP para pedir una recarga. Se instala en todos los modos: sin el
+        manejador, `systemctl reload` terminaría el proceso a mitad de ciclo. En modo
+        de ciclo único no hay recarga pendiente que aplicar, ya que la siguiente
+        ejecución lee la configuración desde cero.
+        """
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self._reload_requested.set())
+
+    def start_watching(self):
+        """
+        Recarga la configuración al recibir SIGHUP o cuando cambian el archivo .env
+        o la tabla config. La recarga ocurre en un hilo aparte, nunca dentro del
+        manejador de la señal.
+        """
+        self.install_signal_handler()
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch, name="settings-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """
+        Detiene la vigilancia de cambios.
+        """
+        self._stop_event.set()
+        self._reload_requested.set()
+
+    def _watch(self):
+        while not self._stop_event.is_set():
+            requested = self._reload_requested.wait(self.settings_watch_seconds)
+            if self._stop_event.is_set():
+                return
+            self._reload_requested.clear()
+            if requested:
+                logger.info("SIGHUP recibido, recargando configuración")
+                self.reload()
+            elif self._source_fingerprint() != self._fingerprint:
+                self.reload()
+
+_settings = None
+_settings_lock = threading.Lock()
+
+def get_settings() -> Settings:
+    """
+    Obtiene la configuración compartida del proceso, cargándola la primera vez.
+    """
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            _settings = Settings()
+        return _settings
@@ -12,32 +12,8 @@ if [ ! -f "rpa/main.py" ]; then
     exit 1
 fi
 
-# Lockfile para evitar ejecuciones simultáneas
-LOCKFILE="/tmp/rpa_system.lock"
-
-# Verificar si ya hay una ejecución en curso
-if [ -f "$LOCKFILE" ]; then
-    PID=$(cat "$LOCKFILE" 2>/dev/null)
-    if kill -0 "$PID" 2>/dev/null; then
-        echo "RPA ya está ejecutándose (PID: $PID)"
-        exit 0
-    else
-        # El proceso ya no existe, eliminar lockfile obsoleto
-        rm -f "$LOCKFILE"
-    fi
-fi
-
-# Crear lockfile con el PID actual
-echo $$ > "$LOCKFILE"
-
-# Función para limpiar el lockfile al salir
-cleanup() {
-    rm -f "$LOCKFILE"
-    exit 0
-}
-
-# Capturar señales para limpiar el lockfile
-trap cleanup EXIT INT TERM
+# Varias ejecuciones (del mismo host o de otros) se coordinan con leases en la base
+# de datos compartida (rpa/coordination.py): cada correo lo procesa un solo worker
 
 # Ejecutar el sistema RPA
 python3 rpa/main.py >> rpa_system.log 2>&1 
\ No newline at end of file
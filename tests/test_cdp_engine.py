@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Pruebas del motor DevTools Protocol (rpa/cdp_engine.py)
+Las pruebas del protocolo usan una conexión falsa con respuestas programadas; la
+prueba en vivo se omite si no hay Chrome disponible.
+
+Uso:
+    python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import tempfile
+import threading
+import unittest
+from collections import deque
+from unittest import mock
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'rpa'))
+
+import websocket  # noqa: E402
+from selenium.common.exceptions import TimeoutException, WebDriverException  # noqa: E402
+import cdp_engine  # noqa: E402
+from cdp_engine import ChromeCDP  # noqa: E402
+
+class FakeWebSocket:
+    """
+    Websocket falso: `handler(method, params, id)` devuelve la lista de mensajes
+    (respuestas y eventos) que Chrome enviaría tras cada comando.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.sent = []
+        self.incoming = deque()
+
+    def send(self, data):
+        message = json.loads(data)
+        self.sent.append(message)
+        for reply in self.handler(message['method'], message['params'], message['id']):
+            self.incoming.append(json.dumps(reply))
+
+    def recv(self):
+        if not self.incoming:
+            raise websocket.WebSocketTimeoutException("sin mensajes")
+        return self.incoming.popleft()
+
+    def settimeout(self, timeout):
+        pass
+
+    def methods(self):
+        return [message['method'] for message in self.sent]
+
+def make_session(handler, timeout=2) -> ChromeCDP:
+    """
+    Crea una sesión conectada a la conexión falsa, sin lanzar Chrome.
+    """
+    session = ChromeCDP.__new__(ChromeCDP)
+    session.timeout = timeout
+    session._next_id = 0
+    session._events = deque()
+    session._ws = FakeWebSocket(handler)
+    return session
+
+def ok(message_id, result=None):
+    return {'id': message_id, 'result': result or {}}
+
+class ProtocolTest(unittest.TestCase):
+
+    def test_call_buffers_events_received_before_the_response(self):
+        session = make_session(lambda method, params, i: [
+            {'method': 'Page.frameStartedLoading', 'params': {}},
+            ok(i, {'value': 1}),
+        ])
+        self.assertEqual(session._call('Page.enable'), {'value': 1})
+        self.assertEqual([event['method'] for event in session._events], ['Page.frameStartedLoading'])
+
+    def test_call_raises_on_protocol_error(self):
+        session = make_session(lambda method, params, i: [
+            {'id': i, 'error': {'code': -32000, 'message': 'No node with given id found'}},
+        ])
+        with self.assertRaises(WebDriverException):
+            session._call('DOM.getContentQuads', objectId='x')
+
+    def test_call_raises_timeout_when_chrome_does_not_answer(self):
+        session = make_session(lambda method, params, i: [])
+        with self.assertRaises(TimeoutException):
+            session._call('Page.enable')
+
+    def test_get_waits_for_load_event(self):
+        def handler(method, params, i):
+            if method == 'Page.navigate':
+                return [ok(i, {'frameId': 'F'}), {'method': 'Page.domContentEventFired', 'params': {}},
+                        {'method': 'Page.loadEventFired', 'params': {}}]
+            return [ok(i)]
+        session = make_session(handler)
+        session.get('http://example.test/')
+        self.assertEqual(session._ws.methods(), ['Page.enable', 'Page.navigate'])
+        self.assertEqual(session._ws.sent[1]['params'], {'url': 'http://example.test/'})
+
+    def test_get_raises_on_navigation_error(self):
+        def handler(method, params, i):
+            if method == 'Page.navigate':
+                return [ok(i, {'frameId': 'F', 'errorText': 'net::ERR_NAME_NOT_RESOLVED'})]
+            return [ok(i)]
+        with self.assertRaises(WebDriverException):
+            make_session(handler).get('http://missing.test/')
+
+    def test_get_raises_timeout_without_load_event(self):
+        session = make_session(lambda method, params, i: [ok(i, {'frameId': 'F'})], timeout=0.1)
+        with self.assertRaises(TimeoutException):
+            session.get('http://slow.test/')
+
+    def test_execute_script_returns_value_and_raises_on_exception(self):
+        def handler(method, params, i):
+            if 'throw' in params['expression']:
+                return [ok(i, {'result': {'type': 'object'}, 'exceptionDetails': {'text': 'Uncaught'}})]
+            return [ok(i, {'result': {'type': 'number', 'value': 200}})]
+        session = make_session(handler)
+        self.assertEqual(session.execute_script("return 200;"), 200)
+        with self.assertRaises(WebDriverException):
+            session.execute_script("throw new Error('x');")
+
+class WaitAndClickTest(unittest.TestCase):
+
+    def test_wait_for_clickable_awaits_the_in_page_observer(self):
+        def handler(method, params, i):
+            return [ok(i, {'result': {'type': 'object', 'subtype': 'node', 'objectId': 'button-1'}})]
+        session = make_session(handler)
+        self.assertEqual(session.wait_for_clickable('button[type="submit"]', 1), 'button-1')
+        sent = session._ws.sent[0]
+        self.assertEqual(sent['method'], 'Runtime.evaluate')
+        self.assertTrue(sent['params']['awaitPromise'])
+        self.assertIn('MutationObserver', sent['params']['expression'])
+        self.assertIn(json.dumps('button[type="submit"]'), sent['params']['expression'])
+        # Una sola consulta por el websocket: no hay sondeo del DOM
+        self.assertEqual(session._ws.methods(), ['Runtime.evaluate'])
+
+    def test_wait_for_clickable_retries_after_navigation(self):
+        replies = deque([
+            lambda i: {'id': i, 'error': {'code': -32000, 'message': 'Execution context was destroyed.'}},
+            lambda i: ok(i, {'result': {'type': 'object', 'subtype': 'node', 'objectId': 'button-2'}}),
+        ])
+        session = make_session(lambda method, params, i: [replies.popleft()(i)])
+        self.assertEqual(session.wait_for_clickable('#confirm', 1), 'button-2')
+        self.assertEqual(session._ws.methods(), ['Runtime.evaluate', 'Runtime.evaluate'])
+
+    def test_wait_for_clickable_times_out(self):
+        session = make_session(lambda method, params, i: [
+            ok(i, {'result': {'type': 'object', 'subtype': 'null', 'value': None}}),
+        ])
+        with self.assertRaises(TimeoutException):
+            session.wait_for_clickable('#confirm', 0.1)
+
+    def test_click_dispatches_mouse_events_at_the_center(self):
+        def handler(method, params, i):
+            if method == 'DOM.getContentQuads':
+                return [ok(i, {'quads': [[10, 20, 50, 20, 50, 40, 10, 40]]})]
+            return [ok(i)]
+        session = make_session(handler)
+        session.click('button-1')
+        mouse = [message['params'] for message in session._ws.sent
+                 if message['method'] == 'Input.dispatchMouseEvent']
+        self.assertEqual([event['type'] for event in mouse], ['mouseMoved', 'mousePressed', 'mouseReleased'])
+        self.assertTrue(all((event['x'], event['y']) == (30, 30) for event in mouse))
+        self.assertEqual(session._ws.methods()[:2], ['DOM.scrollIntoViewIfNeeded', 'DOM.getContentQuads'])
+
+    def test_click_without_visible_area_raises(self):
+        session = make_session(lambda method, params, i: [ok(i, {'quads': []})])
+        with self.assertRaises(WebDriverException):
+            session.click('button-1')
+
+class LaunchTest(unittest.TestCase):
+
+    def temp_profiles(self) -> set:
+        return set(glob.glob(os.path.join(tempfile.gettempdir(), 'rpa_cdp_*')))
+
+    def test_failed_launch_removes_the_temporary_profile(self):
+        before = self.temp_profiles()
+        with mock.patch.object(cdp_engine, 'find_chrome_binary', return_value='/nonexistent/chrome'):
+            with self.assertRaises(FileNotFoundError):
+                ChromeCDP(1)
+        self.assertEqual(self.temp_profiles(), before)
+
+    def test_missing_chrome_creates_no_temporary_profile(self):
+        before = self.temp_profiles()
+        with mock.patch.object(cdp_engine, 'find_chrome_binary',
+                               side_effect=WebDriverException("No se encontró Chrome")):
+            with self.assertRaises(WebDriverException):
+                ChromeCDP(1)
+        self.assertEqual(self.temp_profiles(), before)
+
+def chrome_available() -> bool:
+    try:
+        cdp_engine.find_chrome_binary()
+        return True
+    except WebDriverException:
+        return False
+
+# El botón se inserta deshabilitado a los 300 ms y se habilita 200 ms después
+LIVE_PAGE = b"""<!DOCTYPE html>
+<html><head><title>inicio</title></head>
+<body>
+<script>
+setTimeout(function() {
+    const button = document.createElement('button');
+    button.id = 'confirm';
+    button.textContent = 'Confirmar';
+    button.disabled = true;
+    button.onclick = function() { document.title = 'clic'; };
+    document.body.appendChild(button);
+    setTimeout(function() { button.disabled = false; }, 200);
+}, 300);
+</script>
+</body></html>"""
+
+# El botón está en el HTML desde el inicio y una animación CSS lo hace visible a los
+# 400 ms, sin ninguna mutación del DOM que despierte al MutationObserver
+ANIMATED_PAGE = b"""<!DOCTYPE html>
+<html><head><title>inicio</title>
+<style>
+#confirm { visibility: hidden; animation: show 0s 0.4s forwards; }
+@keyframes show { to { visibility: visible; } }
+</style></head>
+<body>
+<button id="confirm" onclick="document.title = 'clic';">Confirmar</button>
+</body></html>"""
+
+class LivePageHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(ANIMATED_PAGE if self.path == '/animado' else LIVE_PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+@unittest.skipUnless(chrome_available(), "Chrome no disponible")
+class LiveChromeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), LivePageHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.session = ChromeCDP(10)
+
+    def tearDown(self):
+        self.session.quit()
+        self.server.shutdown()
+
+    def wait_for_title(self, title: str):
+        deadline = time.monotonic() + 2
+        while self.session.title != title and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.session.title, title)
+
+    def test_navigate_wait_and_click(self):
+        self.session.get(f"http://127.0.0.1:{self.server.server_port}/")
+        start = time.monotonic()
+        object_id = self.session.wait_for_clickable('#confirm', 5)
+        # No antes de que el botón se habilite
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+        self.session.click(object_id)
+        self.wait_for_title('clic')
+
+    def test_wait_detects_changes_without_mutations(self):
+        self.session.get(f"http://127.0.0.1:{self.server.server_port}/animado")
+        start = time.monotonic()
+        object_id = self.session.wait_for_clickable('#confirm', 5)
+        # Lo detecta la revisión periódica, no el plazo de la espera
+        self.assertLess(time.monotonic() - start, 2)
+        self.session.click(object_id)
+        self.wait_for_title('clic')
+
+if __name__ == "__main__":
+    unittest.main()